@@ -9,11 +9,11 @@ from h5py._hl.dataset import Dataset
 from typing import Tuple, Union, List
 
 try:
-    from numba import jit, prange
+    from numba import jit, prange, get_num_threads
     from numba.core.config import NUMBA_NUM_THREADS as NUM_THREADS
 except (ImportError, ModuleNotFoundError):
     try:
-        from numba import jit, prange
+        from numba import jit, prange, get_num_threads
         from numba.config import NUMBA_NUM_THREADS as NUM_THREADS
     except (ImportError, ModuleNotFoundError):
         print(
@@ -31,6 +31,9 @@ except (ImportError, ModuleNotFoundError):
         prange = range
         NUM_THREADS = 1
 
+        def get_num_threads():
+            return 1
+
 
 @jit(nopython=True)
 def ranges_from_array(array: np.array) -> np.ndarray:
@@ -79,6 +82,332 @@ def ranges_from_array(array: np.array) -> np.ndarray:
     return np.array(output)
 
 
+@jit(nopython=True, fastmath=True)
+def balanced_ranges(cost: np.ndarray, number_of_ranges: int) -> np.ndarray:
+    """
+    Splits a list of items into contiguous ranges of approximately equal
+    total cost.
+
+    Parameters
+    ----------
+    cost : np.array of float
+        (estimated) cost of processing each item
+
+    number_of_ranges : int
+        number of ranges to split the items into
+
+    Returns
+    -------
+    np.array
+        edges of the ranges, of length ``number_of_ranges + 1``; range ``i``
+        corresponds to the items ``edges[i]:edges[i + 1]``
+
+    Examples
+    --------
+    >>> balanced_ranges(np.array([8.0, 1.0, 1.0, 1.0, 1.0, 8.0]), 2)
+    np.array([0, 3, 6])
+
+    Notes
+    -----
+    Splitting items evenly by number gives poor load balancing between threads
+    when the cost per item varies strongly, for instance for particles with a
+    wide range of smoothing lengths. This keeps the items in their original
+    order (and hence their locality in memory), unlike sorting them by cost.
+    The costs must not be negative, as the edges would then no longer be
+    monotonic.
+    """
+    assert np.all(cost >= 0.0), "balanced_ranges requires non-negative costs"
+
+    cumulative_cost = np.cumsum(cost)
+    total_cost = cumulative_cost[-1] if cost.size > 0 else 0.0
+
+    edges = np.empty(number_of_ranges + 1, dtype=np.int64)
+    edges[0] = 0
+    edges[number_of_ranges] = cost.size
+
+    for index in range(1, number_of_ranges):
+        edges[index] = np.searchsorted(
+            cumulative_cost, total_cost * index / number_of_ranges, side="right"
+        )
+
+    return edges
+
+
+@jit(nopython=True)
+def tile_size(
+    res: int, maximal_size: int, dimensions: int, number_of_ranges: int
+) -> int:
+    """
+    Chooses the side length of the square (or cubic) tiles that an image is
+    split into for rendering in parallel.
+
+    Parameters
+    ----------
+    res : int
+        number of pixels along one axis of the image
+
+    maximal_size : int
+        largest side length of a tile, in pixels, e.g. such that a tile fits
+        in cache
+
+    dimensions : int
+        number of dimensions of the image
+
+    number_of_ranges : int
+        number of ranges that the tiles will be split into by
+        ``balanced_ranges``, usually the number of threads
+
+    Returns
+    -------
+    int
+        side length of the tiles, in pixels
+
+    Examples
+    --------
+    >>> tile_size(64, 64, 2, 4)
+    16
+
+    Notes
+    -----
+    The tiles are halved in size until there are at least four of them per
+    range, so that small images are still split between all the threads
+    and ``balanced_ranges`` has some freedom to even out their cost. Tiles
+    are never made smaller than 8 pixels across, as every particle that
+    overlaps several tiles is processed once for each of them.
+    """
+    size = maximal_size
+
+    while size > 8 and ((res + size - 1) // size) ** dimensions < 4 * number_of_ranges:
+        size //= 2
+
+    return size
+
+
+@jit(nopython=True)
+def periodic_copies(box_x: float, box_y: float, box_z: float) -> int:
+    """
+    Counts the periodic copies that are made of each particle.
+
+    Parameters
+    ----------
+    box_x, box_y, box_z : float
+        box size along each axis, or zero if that axis is not periodic
+
+    Returns
+    -------
+    int
+        number of copies of each particle, including the particle itself
+
+    See Also
+    --------
+    periodic_copy : Finds the particle and shifts of a periodic copy
+    """
+    number_of_copies = 1
+
+    for box in (box_x, box_y, box_z):
+        if box != 0.0:
+            number_of_copies *= 3
+
+    return number_of_copies
+
+
+@jit(nopython=True)
+def periodic_copy(
+    copy_index: int, box_x: float, box_y: float, box_z: float
+) -> Tuple[int, int, int, int]:
+    """
+    Finds the particle, and the periodic shifts, of a copy of a particle.
+
+    Parameters
+    ----------
+    copy_index : int
+        index of the copy; the ``periodic_copies(box_x, box_y, box_z)``
+        copies of particle ``i`` have the indices that follow on from
+        ``i * periodic_copies(box_x, box_y, box_z)``
+
+    box_x, box_y, box_z : float
+        box size along each axis, or zero if that axis is not periodic
+
+    Returns
+    -------
+    particle, xshift, yshift, zshift : int
+        index of the particle, and the number of boxes (-1, 0 or 1) that
+        the copy is shifted by along each axis
+
+    Notes
+    -----
+    For each particle, the copies are ordered by their shift in x, then in
+    y and then in z, as in the nested loops over the shifts in the serial
+    scatter functions.
+    """
+    number_of_xshifts = 1 if box_x == 0.0 else 3
+    number_of_yshifts = 1 if box_y == 0.0 else 3
+    number_of_zshifts = 1 if box_z == 0.0 else 3
+    number_of_copies = number_of_xshifts * number_of_yshifts * number_of_zshifts
+
+    if number_of_copies == 1:
+        # Skip the integer divisions, which are slow compared to the
+        # rest of the work done for most copies
+        return copy_index, 0, 0, 0
+
+    particle = copy_index // number_of_copies
+    shifts = copy_index % number_of_copies
+
+    return (
+        particle,
+        shifts // (number_of_yshifts * number_of_zshifts) - number_of_xshifts // 2,
+        (shifts // number_of_zshifts) % number_of_yshifts - number_of_yshifts // 2,
+        shifts % number_of_zshifts - number_of_zshifts // 2,
+    )
+
+
+def tile_binner(footprint):
+    """
+    Creates a function that bins items into the square (or cubic) tiles of
+    an image that they overlap, for rendering the tiles in parallel.
+
+    Parameters
+    ----------
+    footprint : function
+        jitted function, called as ``footprint(item, arguments)``, that
+        returns the (inclusive) range of pixels ``first_x, last_x, first_y,
+        last_y, first_z, last_z`` that an item deposits into. The range is
+        empty (first > last) if the item misses the image. Two dimensional
+        images use ``0, 0`` for the range in z.
+
+    Returns
+    -------
+    function
+        jitted ``bin_into_tiles(number_of_items, size, tiles_per_side,
+        dimensions, number_of_threads, arguments)``, which passes
+        ``arguments`` on to ``footprint`` and returns ``tile_offsets,
+        tile_items, tile_cost``. The items overlapping tile ``i`` are
+        ``tile_items[tile_offsets[i]:tile_offsets[i + 1]]``, in increasing
+        order, and ``tile_cost[i]`` is the number of pixels that they cover
+        in that tile. Tile ``(i, j, k)`` has the index
+        ``(i * tiles_per_side + j) * tiles_per_side + k`` in three
+        dimensions, and ``(i, j)`` the index ``i * tiles_per_side + j`` in
+        two.
+
+    See Also
+    --------
+    tile_size : Chooses the side length of the tiles
+    balanced_ranges : Splits the tiles between threads by their cost
+
+    Notes
+    -----
+    Each of the ``number_of_threads`` threads bins a contiguous chunk of the
+    items, first counting the items in each tile and then, after a prefix
+    sum over the tiles and the threads, storing them into its own slots. ``footprint`` is therefore
+    called twice for each item, and should be cheap.
+    """
+
+    @jit(nopython=True, fastmath=True, parallel=True, cache=True)
+    def bin_into_tiles(
+        number_of_items: int,
+        size: int,
+        tiles_per_side: int,
+        dimensions: int,
+        number_of_threads: int,
+        arguments: Tuple,
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        tiles_per_side_z = tiles_per_side if dimensions == 3 else 1
+        number_of_tiles = tiles_per_side * tiles_per_side * tiles_per_side_z
+        items_per_thread = (
+            number_of_items + number_of_threads - 1
+        ) // number_of_threads
+
+        # First pass: count the items overlapping each tile, and the number
+        # of pixels that they cover within it.
+        thread_tile_counts = np.zeros(
+            (number_of_threads, number_of_tiles), dtype=np.int64
+        )
+        thread_tile_cost = np.zeros(
+            (number_of_threads, number_of_tiles), dtype=np.float64
+        )
+
+        for thread in prange(number_of_threads):
+            for item in range(
+                thread * items_per_thread,
+                min(number_of_items, (thread + 1) * items_per_thread),
+            ):
+                first_x, last_x, first_y, last_y, first_z, last_z = footprint(
+                    item, arguments
+                )
+
+                if first_x > last_x or first_y > last_y or first_z > last_z:
+                    continue
+
+                for tile_x in range(first_x // size, last_x // size + 1):
+                    size_x = (
+                        min(last_x, (tile_x + 1) * size - 1)
+                        - max(first_x, tile_x * size)
+                        + 1
+                    )
+                    for tile_y in range(first_y // size, last_y // size + 1):
+                        size_y = (
+                            min(last_y, (tile_y + 1) * size - 1)
+                            - max(first_y, tile_y * size)
+                            + 1
+                        )
+                        for tile_z in range(first_z // size, last_z // size + 1):
+                            size_z = (
+                                min(last_z, (tile_z + 1) * size - 1)
+                                - max(first_z, tile_z * size)
+                                + 1
+                            )
+                            tile = (
+                                tile_x * tiles_per_side + tile_y
+                            ) * tiles_per_side_z + tile_z
+                            thread_tile_counts[thread, tile] += 1
+                            thread_tile_cost[thread, tile] += size_x * size_y * size_z
+
+        # Prefix sum over the tiles, and the threads within each tile, so
+        # that the items overlapping each tile are stored contiguously and
+        # in order.
+        tile_offsets = np.zeros(number_of_tiles + 1, dtype=np.int64)
+        tile_cost = np.zeros(number_of_tiles, dtype=np.float64)
+        thread_tile_fill = np.zeros(
+            (number_of_threads, number_of_tiles), dtype=np.int64
+        )
+
+        for tile in range(number_of_tiles):
+            tile_offsets[tile + 1] = tile_offsets[tile]
+
+            for thread in range(number_of_threads):
+                thread_tile_fill[thread, tile] = tile_offsets[tile + 1]
+                tile_offsets[tile + 1] += thread_tile_counts[thread, tile]
+                tile_cost[tile] += thread_tile_cost[thread, tile]
+
+        # Second pass: store the items, each thread into its own slots
+        tile_items = np.zeros(tile_offsets[-1], dtype=np.int64)
+
+        for thread in prange(number_of_threads):
+            for item in range(
+                thread * items_per_thread,
+                min(number_of_items, (thread + 1) * items_per_thread),
+            ):
+                first_x, last_x, first_y, last_y, first_z, last_z = footprint(
+                    item, arguments
+                )
+
+                if first_x > last_x or first_y > last_y or first_z > last_z:
+                    continue
+
+                for tile_x in range(first_x // size, last_x // size + 1):
+                    for tile_y in range(first_y // size, last_y // size + 1):
+                        for tile_z in range(first_z // size, last_z // size + 1):
+                            tile = (
+                                tile_x * tiles_per_side + tile_y
+                            ) * tiles_per_side_z + tile_z
+                            tile_items[thread_tile_fill[thread, tile]] = item
+                            thread_tile_fill[thread, tile] += 1
+
+        return tile_offsets, tile_items, tile_cost
+
+    return bin_into_tiles
+
+
 def read_ranges_from_file_unchunked(
     handle: Dataset,
     ranges: np.ndarray,
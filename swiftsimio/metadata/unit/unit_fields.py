@@ -9,96 +9,172 @@ because we don't know the units ahead of time.
 """
 
 from unyt import g, cm, s, statA, K
+from numpy import ndarray
 from typing import Callable
+from functools import lru_cache
 
 
 # DEPRECATED: This should not be used any more by real code as we now
 # read anything directly out of the snapshots.
 
 
-def generate_units(m, l, t, I, T):
+# Dimensions of each field, as powers of the (mass, length, time, current,
+# temperature) units. Fields that are dimensionless (or have no units) are
+# given as None.
+_POWERS = {
+    "coordinates": (0, 1, 0, 0, 0),
+    "masses": (1, 0, 0, 0, 0),
+    "particle_ids": None,
+    "velocities": (0, 1, -1, 0, 0),
+    "potential": (0, 2, -2, 0, 0),
+    "element_abundance": None,
+    "maximal_temperature": (0, 0, 0, 0, 1),
+    "maximal_temperature_scale_factor": None,
+    "maximal_temperature_time": (0, 0, 1, 0, 0),
+    "iron_mass_frac_from_sn1a": None,
+    "metal_mass_frac_from_agb": None,
+    "metal_mass_frac_from_snii": None,
+    "metal_mass_frac_from_sn1a": None,
+    "metallicity": None,
+    "smoothed_element_abundance": None,
+    "smoothed_iron_mass_frac_from_sn1a": None,
+    "smoothed_metallicity": None,
+    "total_mass_from_agb": (1, 0, 0, 0, 0),
+    "total_mass_from_snii": (1, 0, 0, 0, 0),
+    "density": (1, -3, 0, 0, 0),
+    "entropy": (1, 2, -2, 0, -1),
+    "internal_energy": (0, 2, -2, 0, 0),
+    "smoothing_length": (0, 1, 0, 0, 0),
+    "pressure": (1, -1, -2, 0, 0),
+    "diffusion": None,
+    "sfr": (1, 0, -1, 0, 0),
+    "temperature": (0, 0, 0, 0, 1),
+    "viscosity": None,
+    "specific_sfr": (0, 0, -1, 0, 0),
+    "material_id": None,
+    "radiated_energy": (1, 2, -2, 0, 0),
+    "birth_density": (1, -3, 0, 0, 0),
+    "birth_time": (0, 0, 1, 0, 0),
+    "initial_masses": (1, 0, 0, 0, 0),
+}
+
+_SHARED = ("coordinates", "masses", "particle_ids", "velocities", "potential")
+
+_BARYON = (
+    "element_abundance",
+    "maximal_temperature",
+    "maximal_temperature_scale_factor",
+    "maximal_temperature_time",
+    "iron_mass_frac_from_sn1a",
+    "metal_mass_frac_from_agb",
+    "metal_mass_frac_from_snii",
+    "metal_mass_frac_from_sn1a",
+    "metallicity",
+    "smoothed_element_abundance",
+    "smoothed_iron_mass_frac_from_sn1a",
+    "smoothed_metallicity",
+    "total_mass_from_agb",
+    "total_mass_from_snii",
+)
+
+# The (ordered) fields that have units for each particle type.
+_UNIT_FIELDS = {
+    "gas": (
+        "density",
+        "entropy",
+        "internal_energy",
+        "smoothing_length",
+        "pressure",
+        "diffusion",
+        "sfr",
+        "temperature",
+        "viscosity",
+        "specific_sfr",
+        "material_id",
+        "radiated_energy",
+    )
+    + _SHARED
+    + _BARYON,
+    "dark_matter": _SHARED,
+    "boundary": _SHARED,
+    "sinks": _SHARED,
+    "stars": ("birth_density", "birth_time", "initial_masses", "smoothing_length")
+    + _SHARED
+    + _BARYON,
+    "black_holes": _SHARED,
+    "neutrinos": _SHARED,
+}
+
+# Each distinct set of powers only needs to be evaluated once.
+_DISTINCT_POWERS = tuple(
+    dict.fromkeys(x for x in _POWERS.values() if x is not None).keys()
+)
+
+
+def _evaluate_units(base_units: tuple) -> dict:
+    """
+    Evaluates the units of all fields in ``_POWERS`` from the (mass, length,
+    time, current, temperature) ``base_units``.
     """
-    Generates the unit dictionaries with the:
 
-    mass, length, time, current, and temperature
+    evaluated = {None: None}
 
-    ..deprecated:: 3.1.0
-        Everything is read directly out of the snapshots now
+    for powers in _DISTINCT_POWERS:
+        unit = None
 
-    units respectively.
-    """
+        for base_unit, power in zip(base_units, powers):
+            if power == 0:
+                continue
 
-    shared = {
-        "coordinates": l,
-        "masses": m,
-        "particle_ids": None,
-        "velocities": l / t,
-        "potential": l * l / (t * t),
-    }
+            if unit is None and power < 0:
+                # Matches the original ``1 / t`` expressions, which give a
+                # quantity rather than a unit (treated as dimensionless by
+                # generate_dimensions).
+                unit = 1 / base_unit ** -power
+                continue
 
-    baryon = {
-        "element_abundance": None,
-        "maximal_temperature": T,
-        "maximal_temperature_scale_factor": None,
-        "maximal_temperature_time": t,
-        "iron_mass_frac_from_sn1a": None,
-        "metal_mass_frac_from_agb": None,
-        "metal_mass_frac_from_snii": None,
-        "metal_mass_frac_from_sn1a": None,
-        "metallicity": None,
-        "smoothed_element_abundance": None,
-        "smoothed_iron_mass_frac_from_sn1a": None,
-        "smoothed_metallicity": None,
-        "total_mass_from_agb": m,
-        "total_mass_from_snii": m,
-    }
+            factor = base_unit if power == 1 else base_unit ** power
+            unit = factor if unit is None else unit * factor
 
-    gas = {
-        "density": m / (l ** 3),
-        "entropy": m * l ** 2 / (t ** 2 * T),
-        "internal_energy": (l / t) ** 2,
-        "smoothing_length": l,
-        "pressure": m / (l * t ** 2),
-        "diffusion": None,
-        "sfr": m / t,
-        "temperature": T,
-        "viscosity": None,
-        "specific_sfr": 1 / t,
-        "material_id": None,
-        "diffusion": None,
-        "viscosity": None,
-        "radiated_energy": m * (l / t) ** 2,
-        **shared,
-        **baryon,
-    }
+        evaluated[powers] = unit
 
-    dark_matter = {**shared}
+    return {name: evaluated[powers] for name, powers in _POWERS.items()}
 
-    boundary = {**shared}
 
-    sinks = {**shared}
+_evaluate_units_cached = lru_cache(maxsize=16)(_evaluate_units)
 
-    stars = {
-        "birth_density": m / (l ** 3),
-        "birth_time": t,
-        "initial_masses": m,
-        "smoothing_length": l,
-        **shared,
-        **baryon,
-    }
 
-    black_holes = {**shared}
+def generate_units(m, l, t, I, T):
+    """
+    Generates the unit dictionaries with the:
+
+    mass, length, time, current, and temperature
+
+    ..deprecated:: 3.1.0
+        Everything is read directly out of the snapshots now
+
+    units respectively.
+    """
+
+    base_units = (m, l, t, I, T)
 
-    neutrinos = {**shared}
+    try:
+        units = _evaluate_units_cached(base_units)
+    except TypeError:
+        # Unhashable units (e.g. unyt quantities) can't be cached
+        units = _evaluate_units(base_units)
 
+    # Fresh dictionaries are returned, as callers are free to modify them.
+    # Units are immutable and can be shared, but quantities (e.g. the
+    # ``1 / t`` of ``specific_sfr``) can be changed in place, so are copied.
     return {
-        "gas": gas,
-        "dark_matter": dark_matter,
-        "boundary": boundary,
-        "sinks": sinks,
-        "stars": stars,
-        "black_holes": black_holes,
-        "neutrinos": neutrinos,
+        particle_type: {
+            name: units[name].copy()
+            if isinstance(units[name], ndarray)
+            else units[name]
+            for name in names
+        }
+        for particle_type, names in _UNIT_FIELDS.items()
     }
 
 
@@ -5,4 +5,5 @@ Visualisation sub-module for swiftismio.
 from .projection import scatter, project_gas, project_gas_pixel_grid
 from .slice import slice_scatter as slice
 from .slice import slice_gas, slice_gas_pixel_grid
+from .project_and_slice import project_and_slice_gas, project_and_slice_gas_pixel_grid
 from .smoothing_length_generation import generate_smoothing_lengths
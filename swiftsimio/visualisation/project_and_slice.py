@@ -0,0 +1,689 @@
+"""
+Sub-module for creating a projection and a slice of the same data in a
+single pass over the particles.
+"""
+
+from typing import Union, Optional, Tuple
+from numpy import float64, float32, int32, zeros, ndarray, ones, ascontiguousarray
+from unyt import unyt_array, unyt_quantity
+from swiftsimio import SWIFTDataset, cosmo_array
+
+from swiftsimio.accelerated import (
+    jit,
+    prange,
+    get_num_threads,
+    balanced_ranges,
+    tile_size,
+    tile_binner,
+    periodic_copies,
+    periodic_copy,
+)
+from swiftsimio.visualisation.projection_backends.fast import (
+    deposit,
+    overlapped_cells,
+    maximal_panel_size,
+)
+from swiftsimio.visualisation.slice import (
+    kernel_gamma as slice_kernel_gamma,
+    deposit as slice_deposit,
+    overlapped_cells as slice_overlapped_cells,
+)
+
+
+@jit(nopython=True, fastmath=True, cache=True)
+def scatter(
+    x: float64,
+    y: float64,
+    z: float64,
+    m: float32,
+    h: float32,
+    z_slice: float64,
+    res: int,
+    box_x: float64 = 0.0,
+    box_y: float64 = 0.0,
+    box_z: float64 = 0.0,
+) -> Tuple[ndarray, ndarray]:
+    """
+    Creates a weighted projection and slice of the same particles
+
+    Computes the contributions of particles with positions (`x`,`y`,`z`)
+    with smoothing lengths `h` weighted by quantities `m` both to a
+    projection along z and to a slice at `z_slice`, in a single pass over
+    the particles. This includes periodic boundary effects.
+
+    Parameters
+    ----------
+    x : array of float64
+        x-positions of the particles. Must be bounded by [0, 1].
+    y : array of float64
+        y-positions of the particles. Must be bounded by [0, 1].
+    z : array of float64
+        z-positions of the particles. Must be bounded by [0, 1].
+    m : array of float32
+        masses (or otherwise weights) of the particles
+    h : array of float32
+        smoothing lengths of the particles
+    z_slice : float64
+        the position at which we wish to create the slice
+    res : int
+        the number of pixels.
+    box_x: float64
+        box size in x, in the same rescaled length units as x, y and z.
+        Used for periodic wrapping.
+    box_y: float64
+        box size in y, in the same rescaled length units as x, y and z.
+        Used for periodic wrapping.
+    box_z: float64
+        box size in z, in the same rescaled length units as x, y and z.
+        Used for periodic wrapping of the slice.
+
+    Returns
+    -------
+    projection, slice : ndarray of float32
+        the projected and sliced images
+
+    See Also
+    --------
+    scatter_parallel : Parallel implementation of this function
+
+    Notes
+    -----
+    The projection is identical to that of the ``fast`` projection backend,
+    and the slice to that of ``slice_scatter``, as both use the same
+    ``deposit`` functions. Each particle is read once, and then deposited
+    into the projection and, only if it intersects the slice, into the
+    slice.
+    """
+    # Output arrays for our images
+    projection = zeros((res, res), dtype=float32)
+    image_slice = zeros((res, res), dtype=float32)
+
+    if box_x == 0.0:
+        xshift_min = 0
+        xshift_max = 1
+    else:
+        xshift_min = -1
+        xshift_max = 2
+    if box_y == 0.0:
+        yshift_min = 0
+        yshift_max = 1
+    else:
+        yshift_min = -1
+        yshift_max = 2
+    if box_z == 0.0:
+        zshift_min = 0
+        zshift_max = 1
+    else:
+        zshift_min = -1
+        zshift_max = 2
+
+    for x_pos_original, y_pos_original, z_pos_original, mass, hsml in zip(
+        x, y, z, m, h
+    ):
+        # SWIFT stores hsml as the FWHM.
+        kernel_width = slice_kernel_gamma * hsml
+
+        # loop over periodic copies of this particle
+        for xshift in range(xshift_min, xshift_max):
+            for yshift in range(yshift_min, yshift_max):
+                x_pos = x_pos_original + xshift * box_x
+                y_pos = y_pos_original + yshift * box_y
+
+                deposit(projection, x_pos, y_pos, mass, hsml, res, 0, 0)
+
+                for zshift in range(zshift_min, zshift_max):
+                    distance_z = z_pos_original + zshift * box_z - z_slice
+                    distance_z_2 = distance_z * distance_z
+
+                    if distance_z_2 > (kernel_width * kernel_width):
+                        # Most copies do not intersect the slice at all
+                        continue
+
+                    slice_deposit(
+                        image_slice, x_pos, y_pos, distance_z_2, mass, hsml, res, 0, 0
+                    )
+
+    return projection, image_slice
+
+
+@jit(nopython=True, fastmath=True, cache=True, inline="always")
+def copy_overlapped_cells(copy_index: int, arguments: tuple):
+    """
+    Finds the range of pixels that a periodic copy (in x and y) of a particle
+    deposits into, in either the projection or the slice, for binning the
+    copies with ``tile_binner``
+
+    Parameters
+    ----------
+    copy_index : int
+        index of the copy, see ``accelerated.periodic_copy``
+    arguments : tuple
+        the positions ``x`` and ``y``, smoothing lengths ``h``, the smallest
+        squared distances ``distance_z_2_min`` of any copy in z to the
+        slice, the resolution ``res`` and the box sizes ``box_x`` and
+        ``box_y``
+
+    Returns
+    -------
+    first_cell_x, last_cell_x, first_cell_y, last_cell_y : int
+        the smallest range of pixels that covers the ranges of both
+        ``overlapped_cells`` functions, followed by ``0, 0`` for the range
+        in z.
+    """
+    x, y, h, distance_z_2_min, res, box_x, box_y = arguments
+    particle, xshift, yshift, _ = periodic_copy(copy_index, box_x, box_y, 0.0)
+
+    x_pos = x[particle] + xshift * box_x
+    y_pos = y[particle] + yshift * box_y
+
+    first_x, last_x, first_y, last_y = overlapped_cells(x_pos, y_pos, h[particle], res)
+    slice_cells = slice_overlapped_cells(
+        x_pos, y_pos, distance_z_2_min[particle], h[particle], res
+    )
+
+    if first_x > last_x or first_y > last_y:
+        # Only the slice (if anything) can be overlapped
+        first_x, last_x, first_y, last_y = slice_cells
+    elif slice_cells[0] <= slice_cells[1] and slice_cells[2] <= slice_cells[3]:
+        first_x = min(first_x, slice_cells[0])
+        last_x = max(last_x, slice_cells[1])
+        first_y = min(first_y, slice_cells[2])
+        last_y = max(last_y, slice_cells[3])
+
+    return first_x, last_x, first_y, last_y, 0, 0
+
+
+bin_into_panels = tile_binner(copy_overlapped_cells)
+
+
+@jit(nopython=True, fastmath=True, parallel=True, cache=True)
+def scatter_panels(
+    x: float64,
+    y: float64,
+    z: float64,
+    m: float32,
+    h: float32,
+    z_slice: float64,
+    res: int,
+    box_x: float64,
+    box_y: float64,
+    box_z: float64,
+    number_of_threads: int,
+) -> Tuple[ndarray, ndarray]:
+    """
+    Creates a weighted projection and slice of the same particles by
+    rendering square panels of the images in parallel
+
+    Parameters
+    ----------
+    x, y, z, m, h, z_slice, res, box_x, box_y, box_z
+        as for ``scatter_parallel``
+    number_of_threads : int
+        the number of threads to split the panels between
+
+    Returns
+    -------
+    projection, slice : ndarray of float32
+        the projected and sliced images
+
+    See Also
+    --------
+    scatter_parallel : Parallel implementation of scatter
+    """
+    # Same as scatter, but executes in parallel! The images are split into
+    # square panels, and each thread renders a range of panels into a pair
+    # of small scratch tiles; see fast.scatter_panels.
+    maximal_array_index = int32(res) - 1
+    panel_size = tile_size(res, maximal_panel_size, 2, number_of_threads)
+    panels_per_side = (res + panel_size - 1) // panel_size
+
+    if box_z == 0.0:
+        zshift_min = 0
+        zshift_max = 1
+    else:
+        zshift_min = -1
+        zshift_max = 2
+
+    # The smallest squared z-distance to the slice of any of the periodic
+    # copies of each particle; this decides whether it is in the slice.
+    distance_z_2_min = zeros(x.size, dtype=float64)
+
+    for particle in prange(x.size):
+        distance_z_2_min[particle] = (z[particle] - z_slice) ** 2
+        for zshift in range(zshift_min, zshift_max):
+            distance_z_2_min[particle] = min(
+                distance_z_2_min[particle],
+                (z[particle] + zshift * box_z - z_slice) ** 2,
+            )
+
+    # Only the copies in x and y are binned; each is deposited into the
+    # slice once for every copy in z.
+    panel_offsets, panel_copies, panel_cost = bin_into_panels(
+        x.size * periodic_copies(box_x, box_y, 0.0),
+        panel_size,
+        panels_per_side,
+        2,
+        number_of_threads,
+        (x, y, h, distance_z_2_min, res, box_x, box_y),
+    )
+
+    # Split the panels between threads such that each thread computes
+    # roughly the same number of pixels.
+    thread_edges = balanced_ranges(panel_cost, number_of_threads)
+
+    projection = zeros((res, res), dtype=float32)
+    image_slice = zeros((res, res), dtype=float32)
+
+    for thread in prange(number_of_threads):
+        # Each thread re-uses a single pair of scratch buffers for all of
+        # its panels
+        projection_tile = zeros(panel_size * panel_size, dtype=float32)
+        slice_tile = zeros(panel_size * panel_size, dtype=float32)
+
+        for panel in range(thread_edges[thread], thread_edges[thread + 1]):
+            first_cell_x = (panel // panels_per_side) * panel_size
+            first_cell_y = (panel % panels_per_side) * panel_size
+            size_x = min(panel_size, maximal_array_index + 1 - first_cell_x)
+            size_y = min(panel_size, maximal_array_index + 1 - first_cell_y)
+
+            # Reshaping the front of the buffers keeps the tiles contiguous
+            panel_projection = projection_tile[: size_x * size_y].reshape(
+                (size_x, size_y)
+            )
+            panel_slice = slice_tile[: size_x * size_y].reshape((size_x, size_y))
+            panel_projection[:, :] = 0.0
+            panel_slice[:, :] = 0.0
+
+            for index in range(panel_offsets[panel], panel_offsets[panel + 1]):
+                particle, xshift, yshift, _ = periodic_copy(
+                    panel_copies[index], box_x, box_y, 0.0
+                )
+
+                x_pos = x[particle] + xshift * box_x
+                y_pos = y[particle] + yshift * box_y
+
+                deposit(
+                    panel_projection,
+                    x_pos,
+                    y_pos,
+                    m[particle],
+                    h[particle],
+                    res,
+                    first_cell_x,
+                    first_cell_y,
+                )
+
+                for zshift in range(zshift_min, zshift_max):
+                    distance_z = z[particle] + zshift * box_z - z_slice
+
+                    slice_deposit(
+                        panel_slice,
+                        x_pos,
+                        y_pos,
+                        distance_z * distance_z,
+                        m[particle],
+                        h[particle],
+                        res,
+                        first_cell_x,
+                        first_cell_y,
+                    )
+
+            projection[
+                first_cell_x : first_cell_x + size_x,
+                first_cell_y : first_cell_y + size_y,
+            ] = panel_projection
+            image_slice[
+                first_cell_x : first_cell_x + size_x,
+                first_cell_y : first_cell_y + size_y,
+            ] = panel_slice
+
+    return projection, image_slice
+
+
+def scatter_parallel(
+    x: float64,
+    y: float64,
+    z: float64,
+    m: float32,
+    h: float32,
+    z_slice: float64,
+    res: int,
+    box_x: float64 = 0.0,
+    box_y: float64 = 0.0,
+    box_z: float64 = 0.0,
+) -> Tuple[ndarray, ndarray]:
+    """
+    Parallel implementation of scatter
+
+    Creates a weighted projection and slice of the same particles,
+    including periodic boundary effects.
+
+    Parameters
+    ----------
+    x : array of float64
+        x-positions of the particles. Must be bounded by [0, 1].
+    y : array of float64
+        y-positions of the particles. Must be bounded by [0, 1].
+    z : array of float64
+        z-positions of the particles. Must be bounded by [0, 1].
+    m : array of float32
+        masses (or otherwise weights) of the particles
+    h : array of float32
+        smoothing lengths of the particles
+    z_slice : float64
+        the position at which we wish to create the slice
+    res : int
+        the number of pixels.
+    box_x: float64
+        box size in x, in the same rescaled length units as x, y and z.
+        Used for periodic wrapping.
+    box_y: float64
+        box size in y, in the same rescaled length units as x, y and z.
+        Used for periodic wrapping.
+    box_z: float64
+        box size in z, in the same rescaled length units as x, y and z.
+        Used for periodic wrapping of the slice.
+
+    Returns
+    -------
+    projection, slice : ndarray of float32
+        the projected and sliced images
+
+    See Also
+    --------
+    scatter : Creates a projection and slice of SWIFT data
+    scatter_panels : Creates a projection and slice of SWIFT data in panels
+
+    Notes
+    -----
+    This renders the images with ``scatter_panels`` using numba's current
+    number of threads. With a single thread there is nothing to share out,
+    and binning the particles into panels would only add to the work of
+    ``scatter``, so that is called instead.
+    """
+    number_of_threads = get_num_threads()
+
+    if number_of_threads == 1:
+        return scatter(x, y, z, m, h, z_slice, res, box_x, box_y, box_z)
+
+    return scatter_panels(
+        x, y, z, m, h, z_slice, res, box_x, box_y, box_z, number_of_threads
+    )
+
+
+def project_and_slice_gas_pixel_grid(
+    data: SWIFTDataset,
+    resolution: int,
+    z_slice: Optional[unyt_quantity] = None,
+    region: Union[None, unyt_array] = None,
+    parallel: bool = True,
+    project: Union[str, None] = "masses",
+    periodic: bool = True,
+) -> Tuple[ndarray, ndarray]:
+    """
+    Creates a 2D projection and a 2D slice of a SWIFT dataset, weighted by
+    the same data field, in the form of pixel grids.
+
+    Parameters
+    ----------
+    data : SWIFTDataset
+        Dataset from which the images are created
+
+    resolution : int
+        Specifies size of return arrays
+
+    z_slice : unyt_quantity
+        Specifies the location along the z-axis where the slice is to be
+        extracted.
+
+    region : unyt_array, optional
+        determines where the images will be created
+        (this corresponds to the left and right-hand edges, and top and bottom edges)
+        if it is not None. It should have a length of four, and take the form:
+
+        [x_min, x_max, y_min, y_max]
+
+        Particles outside of this range are still considered if their
+        smoothing lengths overlap with the range.
+
+    parallel : bool, optional
+        used to determine if we will create the images in parallel. This
+        defaults to True.
+
+    project : str, optional
+        Data field to be projected and sliced. Default is mass. If None then
+        simply count number of particles
+
+    periodic : bool, optional
+        Account for periodic boundaries for the simulation box?
+        Default is ``True``.
+
+    Returns
+    -------
+    projection, slice : ndarray of float32
+        `resolution` x `resolution` arrays, without appropriate units. These
+        are the same as the images of ``project_gas_pixel_grid`` (with the
+        ``fast`` backend) and ``slice_gas_pixel_grid``.
+
+    See Also
+    --------
+    project_and_slice_gas : Creates both images with appropriate units
+    """
+
+    if z_slice is None:
+        z_slice = 0.0 * data.gas.coordinates.units
+
+    number_of_gas_particles = data.gas.coordinates.shape[0]
+
+    if project is None:
+        m = ones(number_of_gas_particles, dtype=float32)
+    else:
+        m = getattr(data.gas, project)
+        if data.gas.coordinates.comoving:
+            if not m.compatible_with_comoving():
+                raise AttributeError(
+                    f'Physical quantity "{project}" is not compatible with comoving coordinates!'
+                )
+        else:
+            if not m.compatible_with_physical():
+                raise AttributeError(
+                    f'Comoving quantity "{project}" is not compatible with physical coordinates!'
+                )
+        m = m.value
+
+    box_x, box_y, box_z = data.metadata.boxsize
+
+    if z_slice > box_z or z_slice < (0 * box_z):
+        raise ValueError("Please enter a slice value inside the box.")
+
+    # Set the limits of the image.
+    if region is not None:
+        x_min, x_max, y_min, y_max = region
+    else:
+        x_min = (0 * box_x).to(box_x.units)
+        x_max = box_x
+        y_min = (0 * box_y).to(box_y.units)
+        y_max = box_y
+
+    x_range = x_max - x_min
+    y_range = y_max - y_min
+
+    # Deal with non-cubic boxes:
+    # we always use the maximum of x_range and y_range to normalise the coordinates
+    # empty pixels in the resulting square image are trimmed afterwards
+    max_range = max(x_range, y_range)
+
+    x, y, z = data.gas.coordinates.T
+
+    try:
+        hsml = data.gas.smoothing_lengths
+    except AttributeError:
+        # Backwards compatibility
+        hsml = data.gas.smoothing_length
+    if data.gas.coordinates.comoving:
+        if not hsml.compatible_with_comoving():
+            raise AttributeError(
+                f"Physical smoothing length is not compatible with comoving coordinates!"
+            )
+    else:
+        if not hsml.compatible_with_physical():
+            raise AttributeError(
+                f"Comoving smoothing length is not compatible with physical coordinates!"
+            )
+
+    if periodic:
+        periodic_box_x = box_x / max_range
+        periodic_box_y = box_y / max_range
+        periodic_box_z = box_z / max_range
+    else:
+        periodic_box_x = 0.0
+        periodic_box_y = 0.0
+        periodic_box_z = 0.0
+
+    common_parameters = dict(
+        x=(x - x_min) / max_range,
+        y=(y - y_min) / max_range,
+        z=z / max_range,
+        m=ascontiguousarray(m, dtype=float32),
+        h=ascontiguousarray(hsml / max_range, dtype=float32),
+        z_slice=z_slice / max_range,
+        res=int(resolution),
+        box_x=periodic_box_x,
+        box_y=periodic_box_y,
+        box_z=periodic_box_z,
+    )
+
+    if parallel:
+        projection, image_slice = scatter_parallel(**common_parameters)
+    else:
+        projection, image_slice = scatter(**common_parameters)
+
+    # determine the effective number of pixels for each dimension
+    xres = int(resolution * x_range / max_range)
+    yres = int(resolution * y_range / max_range)
+
+    # trim the images to remove empty pixels
+    return projection[:xres, :yres], image_slice[:xres, :yres]
+
+
+def project_and_slice_gas(
+    data: SWIFTDataset,
+    resolution: int,
+    z_slice: Optional[unyt_quantity] = None,
+    region: Union[None, unyt_array] = None,
+    parallel: bool = True,
+    project: Union[str, None] = "masses",
+    periodic: bool = True,
+) -> Tuple[cosmo_array, cosmo_array]:
+    """
+    Creates a 2D projection and a 2D slice of a SWIFT dataset, weighted by
+    the same data field.
+
+    This is equivalent to calling both ``project_gas`` and ``slice_gas``,
+    but only traverses the particles (and the pixels that they overlap)
+    once.
+
+    Parameters
+    ----------
+    data : SWIFTDataset
+        Dataset from which the images are created
+
+    resolution : int
+        Specifies size of return arrays
+
+    z_slice : unyt_quantity
+        Specifies the location along the z-axis where the slice is to be
+        extracted.
+
+    region : unyt_array, optional
+        determines where the images will be created
+        (this corresponds to the left and right-hand edges, and top and bottom edges)
+        if it is not None. It should have a length of four, and take the form:
+
+        [x_min, x_max, y_min, y_max]
+
+        Particles outside of this range are still considered if their
+        smoothing lengths overlap with the range.
+
+    parallel : bool, optional
+        used to determine if we will create the images in parallel. This
+        defaults to True.
+
+    project : str, optional
+        Data field to be projected and sliced. Default is mass. If None then
+        simply count number of particles
+
+    periodic : bool, optional
+        Account for periodic boundaries for the simulation box?
+        Default is ``True``.
+
+    Returns
+    -------
+    projection : cosmo_array
+        Projected image with units of project / length^2
+    slice : cosmo_array
+        Sliced image with units of project / length^3
+
+    See Also
+    --------
+    project_gas : Creates a 2D projection of a SWIFT dataset
+    slice_gas : Creates a 2D slice of a SWIFT dataset
+    """
+
+    projection, image_slice = project_and_slice_gas_pixel_grid(
+        data=data,
+        resolution=resolution,
+        z_slice=z_slice,
+        region=region,
+        parallel=parallel,
+        project=project,
+        periodic=periodic,
+    )
+
+    if region is not None:
+        x_range = region[1] - region[0]
+        y_range = region[3] - region[2]
+        max_range = max(x_range, y_range)
+        projection_units = 1.0 / (max_range ** 2)
+        slice_units = 1.0 / (max_range ** 3)
+        # Unfortunately this is required to prevent us from {over,under}flowing
+        # the units...
+        projection_units.convert_to_units(1.0 / (x_range.units * y_range.units))
+        slice_units.convert_to_units(
+            1.0 / (x_range.units * y_range.units * data.metadata.boxsize.units)
+        )
+    else:
+        max_range = max(data.metadata.boxsize[0], data.metadata.boxsize[1])
+        projection_units = 1.0 / (max_range ** 2)
+        slice_units = 1.0 / (max_range ** 3)
+        # Unfortunately this is required to prevent us from {over,under}flowing
+        # the units...
+        projection_units.convert_to_units(1.0 / data.metadata.boxsize.units ** 2)
+        slice_units.convert_to_units(1.0 / data.metadata.boxsize.units ** 3)
+
+    comoving = data.gas.coordinates.comoving
+    coord_cosmo_factor = data.gas.coordinates.cosmo_factor
+    if project is not None:
+        projection_units *= getattr(data.gas, project).units
+        slice_units *= getattr(data.gas, project).units
+        project_cosmo_factor = getattr(data.gas, project).cosmo_factor
+        projection_cosmo_factor = project_cosmo_factor / coord_cosmo_factor ** 2
+        slice_cosmo_factor = project_cosmo_factor / coord_cosmo_factor ** 3
+    else:
+        projection_cosmo_factor = coord_cosmo_factor ** (-2)
+        slice_cosmo_factor = coord_cosmo_factor ** (-3)
+
+    return (
+        cosmo_array(
+            projection,
+            units=projection_units,
+            cosmo_factor=projection_cosmo_factor,
+            comoving=comoving,
+        ),
+        cosmo_array(
+            image_slice,
+            units=slice_units,
+            cosmo_factor=slice_cosmo_factor,
+            comoving=comoving,
+        ),
+    )
@@ -15,9 +15,12 @@ from numpy import (
     ones,
     isclose,
     matmul,
+    ascontiguousarray,
     empty_like,
+    zeros_like,
     logical_and,
     s_,
+    bool_,
 )
 from unyt import unyt_array, unyt_quantity, exceptions
 from swiftsimio import SWIFTDataset, cosmo_array
@@ -40,6 +43,136 @@ from swiftsimio.visualisation.projection_backends.kernels import (
 scatter = backends["fast"]
 scatter_parallel = backends_parallel["fast"]
 
+# Number of cells along each axis of the coarse grid used to find the
+# particles that can contribute to an image of a region.
+culling_cells = 32
+
+
+@jit(nopython=True, fastmath=True, cache=True)
+def particles_overlapping_image(
+    x: float64,
+    y: float64,
+    h: float32,
+    res: int,
+    box_x: float64 = 0.0,
+    box_y: float64 = 0.0,
+    number_of_cells: int = culling_cells,
+) -> ndarray:
+    """
+    Finds the particles whose kernels (or those of their periodic copies)
+    may overlap the [0, 1] x [0, 1] image
+
+    The particles are binned onto a coarse grid spanning their extent,
+    keeping track of the largest smoothing length in each cell. Whole cells
+    that cannot reach the image are then discarded at once.
+
+    Parameters
+    ----------
+
+    x : np.array[float64]
+        array of x-positions of the particles, in the units of the image.
+
+    y : np.array[float64]
+        array of y-positions of the particles, in the units of the image.
+
+    h : np.array[float32]
+        array of smoothing lengths of the particles
+
+    res : int
+        the number of pixels along one axis of the image.
+
+    box_x: float64
+        box size in x, in the same rescaled length units as x and y. Used
+        for periodic wrapping.
+
+    box_y: float64
+        box size in y, in the same rescaled length units as x and y. Used
+        for periodic wrapping.
+
+    number_of_cells : int
+        the number of cells along each axis of the coarse grid.
+
+    Returns
+    -------
+
+    np.array[bool]
+        whether each particle may contribute to the image. This is a
+        conservative estimate: no contributing particle is ever discarded.
+    """
+    number_of_particles = x.size
+    overlapping = zeros(number_of_particles, dtype=bool_)
+
+    if number_of_particles == 0:
+        return overlapping
+
+    x_min = x.min()
+    y_min = y.min()
+    cell_width_x = (x.max() - x_min) / number_of_cells
+    cell_width_y = (y.max() - y_min) / number_of_cells
+    inverse_cell_width_x = 1.0 / cell_width_x if cell_width_x > 0.0 else 0.0
+    inverse_cell_width_y = 1.0 / cell_width_y if cell_width_y > 0.0 else 0.0
+
+    # Bin the particles, and find the largest kernel in each cell
+    particle_cells = zeros(number_of_particles, dtype=int32)
+    cell_h_max = zeros(number_of_cells * number_of_cells, dtype=float32)
+
+    for particle in range(number_of_particles):
+        cell_x = min(
+            int32((x[particle] - x_min) * inverse_cell_width_x), number_of_cells - 1
+        )
+        cell_y = min(
+            int32((y[particle] - y_min) * inverse_cell_width_y), number_of_cells - 1
+        )
+        cell = cell_x * number_of_cells + cell_y
+
+        particle_cells[particle] = cell
+        cell_h_max[cell] = max(cell_h_max[cell], h[particle])
+
+    if box_x == 0.0:
+        xshift_min = 0
+        xshift_max = 1
+    else:
+        xshift_min = -1
+        xshift_max = 2
+    if box_y == 0.0:
+        yshift_min = 0
+        yshift_max = 1
+    else:
+        yshift_min = -1
+        yshift_max = 2
+
+    # Kernels span up to 1 + kernel_gamma * h * res cells around the cell
+    # that their particle lives in; allow for the extra cells.
+    pixel_slack = 2.0 / res
+
+    cell_overlaps = zeros(number_of_cells * number_of_cells, dtype=bool_)
+
+    for cell_x in range(number_of_cells):
+        low_x = x_min + cell_x * cell_width_x
+        high_x = low_x + cell_width_x
+
+        for cell_y in range(number_of_cells):
+            low_y = y_min + cell_y * cell_width_y
+            high_y = low_y + cell_width_y
+
+            cell = cell_x * number_of_cells + cell_y
+            reach = kernel_gamma * cell_h_max[cell] + pixel_slack
+
+            for xshift in range(xshift_min, xshift_max):
+                for yshift in range(yshift_min, yshift_max):
+                    if (
+                        low_x + xshift * box_x - reach <= 1.0
+                        and high_x + xshift * box_x + reach >= 0.0
+                        and low_y + yshift * box_y - reach <= 1.0
+                        and high_y + yshift * box_y + reach >= 0.0
+                    ):
+                        cell_overlaps[cell] = True
+
+    for particle in range(number_of_particles):
+        overlapping[particle] = cell_overlaps[particle_cells[particle]]
+
+    return overlapping
+
 
 def project_pixel_grid(
     data: __SWIFTParticleDataset,
@@ -104,7 +237,9 @@ def project_pixel_grid(
 
     parallel: bool, optional
         Defaults to ``False``, whether or not to create the image in parallel.
-        The parallel version of this function uses significantly more memory.
+        With the default ``fast`` backend, this needs little more memory than
+        the serial version; the other backends make a copy of the image for
+        each thread, and so use significantly more memory.
 
     backend: str, optional
         Backend to use. See documentation for details. Defaults to 'fast'.
@@ -161,6 +296,11 @@ def project_pixel_grid(
                 )
         m = m.value
 
+    # Numba compiles the backends separately for each integer type (but not
+    # for each value) of the resolution, so make sure that they only ever see
+    # one; numpy integers would otherwise trigger another slow compilation.
+    resolution = int(resolution)
+
     # This provides a default 'slice it all' mask.
     if mask is None:
         mask = s_[:]
@@ -242,11 +382,35 @@ def project_pixel_grid(
         periodic_box_x = 0.0
         periodic_box_y = 0.0
 
+    x_image = (x[combined_mask] - x_min) / max_range
+    y_image = (y[combined_mask] - y_min) / max_range
+    m_image = ascontiguousarray(m[combined_mask])
+    h_image = ascontiguousarray(hsml[combined_mask] / max_range, dtype=float32)
+
+    if region is not None or rotation_center is not None:
+        # Most of the particles in the box may be far away from a small (or
+        # rotated) region; only pass on those that may contribute to the
+        # image. The histogram backend ignores (and may not even have) the
+        # smoothing lengths, so only the positions are used for it.
+        overlapping = particles_overlapping_image(
+            x_image,
+            y_image,
+            zeros_like(h_image) if backend == "histogram" else h_image,
+            resolution,
+            periodic_box_x,
+            periodic_box_y,
+        )
+
+        x_image = x_image[overlapping]
+        y_image = y_image[overlapping]
+        m_image = m_image[overlapping]
+        h_image = h_image[overlapping]
+
     common_arguments = dict(
-        x=(x[combined_mask] - x_min) / max_range,
-        y=(y[combined_mask] - y_min) / max_range,
-        m=m[combined_mask],
-        h=hsml[combined_mask] / max_range,
+        x=x_image,
+        y=y_image,
+        m=m_image,
+        h=h_image,
         res=resolution,
         box_x=periodic_box_x,
         box_y=periodic_box_y,
@@ -326,7 +490,9 @@ def project_gas_pixel_grid(
 
     parallel: bool, optional
         Defaults to ``False``, whether or not to create the image in parallel.
-        The parallel version of this function uses significantly more memory.
+        With the default ``fast`` backend, this needs little more memory than
+        the serial version; the other backends make a copy of the image for
+        each thread, and so use significantly more memory.
 
     backend: str, optional
         Backend to use. See documentation for details. Defaults to 'fast'.
@@ -429,7 +595,9 @@ def project_gas(
 
     parallel: bool, optional
         Defaults to ``False``, whether or not to create the image in parallel.
-        The parallel version of this function uses significantly more memory.
+        With the default ``fast`` backend, this needs little more memory than
+        the serial version; the other backends make a copy of the image for
+        each thread, and so use significantly more memory.
 
     backend: str, optional
         Backend to use. See documentation for details. Defaults to 'fast'.
@@ -1,11 +1,14 @@
 """
 Backends for density projection.
 
-These go in order (within the dictionary) from
+These go in order (within ``backend_list`` and the dictionaries) from
 fastest to most accurate, with the "_reference" style
 being a developer-only indended feature.
 """
 
+from collections import namedtuple
+from numpy import float32
+
 from swiftsimio.visualisation.projection_backends.fast import scatter as fast
 from swiftsimio.visualisation.projection_backends.fast import (
     scatter_parallel as fast_parallel,
@@ -42,27 +45,42 @@ from swiftsimio.visualisation.projection_backends.subsampled_extreme import (
     scatter_parallel as subsampled_extreme_parallel,
 )
 
+from swiftsimio.visualisation.projection_backends.numpy_addat import (
+    scatter as numpy_addat,
+)
+from swiftsimio.visualisation.projection_backends.numpy_addat import (
+    scatter_parallel as numpy_addat_parallel,
+)
+
 from swiftsimio.visualisation.projection_backends.gpu import scatter as gpu
 from swiftsimio.visualisation.projection_backends.gpu import (
     scatter_parallel as gpu_parallel,
 )
 
-backends = {
-    "histogram": histogram,
-    "fast": fast,
-    "renormalised": renormalised,
-    "subsampled": subsampled,
-    "subsampled_extreme": subsampled_extreme,
-    "reference": reference,
-    "gpu": gpu,
-}
+Backend = namedtuple(
+    "Backend", ["name", "scatter", "scatter_parallel", "dtype", "requires_cuda"]
+)
+
+# All backends, in order, with the dtype that they require for the masses
+# and smoothing lengths (None if any floating point type is accepted), and
+# whether they require a CUDA device.
+backend_list = (
+    Backend("histogram", histogram, histogram_parallel, None, False),
+    Backend("fast", fast, fast_parallel, None, False),
+    Backend("renormalised", renormalised, renormalised_parallel, None, False),
+    Backend("subsampled", subsampled, subsampled_parallel, None, False),
+    Backend(
+        "subsampled_extreme",
+        subsampled_extreme,
+        subsampled_extreme_parallel,
+        None,
+        False,
+    ),
+    Backend("reference", reference, reference_parallel, None, False),
+    Backend("numpy_addat", numpy_addat, numpy_addat_parallel, None, False),
+    Backend("gpu", gpu, gpu_parallel, float32, True),
+)
+
+backends = {backend.name: backend.scatter for backend in backend_list}
 
-backends_parallel = {
-    "histogram": histogram_parallel,
-    "fast": fast_parallel,
-    "renormalised": renormalised_parallel,
-    "subsampled": subsampled_parallel,
-    "subsampled_extreme": subsampled_extreme_parallel,
-    "reference": reference_parallel,
-    "gpu": gpu_parallel,
-}
+backends_parallel = {backend.name: backend.scatter_parallel for backend in backend_list}
@@ -9,13 +9,18 @@ The original smoothing code. This provides no renormalisation.
 """
 
 
-from typing import Union
 from math import sqrt
 from numpy import float64, float32, int32, zeros, ndarray
 
-from swiftsimio.accelerated import jit, NUM_THREADS, prange
-from swiftsimio.visualisation.projection_backends.kernels import (
-    kernel_single_precision as kernel,
+from swiftsimio.accelerated import (
+    jit,
+    get_num_threads,
+    prange,
+    balanced_ranges,
+    tile_size,
+    tile_binner,
+    periodic_copies,
+    periodic_copy,
 )
 from swiftsimio.visualisation.projection_backends.kernels import (
     kernel_constant,
@@ -23,7 +28,262 @@ from swiftsimio.visualisation.projection_backends.kernels import (
 )
 
 
-@jit(nopython=True, fastmath=True)
+# Largest side length, in pixels, of the square panels that the parallel
+# implementation splits the image into. A float32 panel fits in L1 cache.
+maximal_panel_size = 64
+
+
+@jit(nopython=True, fastmath=True, cache=True)
+def deposit(
+    image: ndarray,
+    x_pos: float64,
+    y_pos: float64,
+    mass: float32,
+    hsml: float32,
+    res: int,
+    first_cell_x: int,
+    first_cell_y: int,
+):
+    """
+    Deposits a single particle into a section of the image
+
+    Adds the contribution of a particle at position (`x_pos`, `y_pos`)
+    with smoothing length `hsml` weighted by `mass` to the pixels of a
+    `res` * `res` image that lie within the given section.
+
+    Parameters
+    ----------
+
+    image : np.array[float32]
+        the section of the image to deposit into; this covers the pixels
+        ``first_cell_x`` to ``first_cell_x + image.shape[0]`` in x (and
+        correspondingly in y) of the full image.
+
+    x_pos : float64
+        x-position of the particle. The full image spans [0, 1].
+
+    y_pos : float64
+        y-position of the particle. The full image spans [0, 1].
+
+    mass : float32
+        mass (or otherwise weight) of the particle
+
+    hsml : float32
+        smoothing length of the particle
+
+    res : int
+        the number of pixels along one axis of the full image.
+
+    first_cell_x : int
+        the x index, in the full image, of the first pixel of the section.
+
+    first_cell_y : int
+        the y index, in the full image, of the first pixel of the section.
+
+    See Also
+    --------
+
+    scatter : Creates 2D scatter plot from SWIFT data
+    """
+    # Keep all pixel indices as int32; 64 bit integer to float conversions
+    # prevent the inner loop from being vectorised.
+    section_x = int32(first_cell_x)
+    section_y = int32(first_cell_y)
+    section_size_x = int32(image.shape[0])
+    section_size_y = int32(image.shape[1])
+    last_cell_x = section_x + section_size_x - 1
+    last_cell_y = section_y + section_size_y - 1
+
+    # Change that integer to a float, we know that our x, y are bounded
+    # by [0, 1].
+    float_res = float32(res)
+    pixel_width = float32(1.0) / float_res
+
+    # We need this for combining with the x_pos and y_pos variables.
+    float_res_64 = float64(res)
+
+    # Pre-calculate this constant for use with the above
+    inverse_cell_area = res * res
+
+    # Normalisation of the kernel, see kernels.kernel_single_precision
+    kernel_norm = float32(kernel_constant)
+
+    # Calculate the cell that this particle; use the 64 bit version of the
+    # resolution as this is the same type as the positions
+    particle_cell_x = int32(float_res_64 * x_pos)
+    particle_cell_y = int32(float_res_64 * y_pos)
+
+    # SWIFT stores hsml as the FWHM.
+    kernel_width = kernel_gamma * hsml
+
+    # The number of cells that this kernel spans
+    cells_spanned = int32(1.0 + kernel_width * float_res)
+
+    if (
+        particle_cell_x + cells_spanned < section_x
+        or particle_cell_x - cells_spanned > last_cell_x
+        or particle_cell_y + cells_spanned < section_y
+        or particle_cell_y - cells_spanned > last_cell_y
+    ):
+        # Can happily skip this particle
+        return
+
+    if cells_spanned <= 1:
+        # Easygame, gg
+        if (
+            particle_cell_x >= section_x
+            and particle_cell_x <= last_cell_x
+            and particle_cell_y >= section_y
+            and particle_cell_y <= last_cell_y
+        ):
+            image[particle_cell_x - section_x, particle_cell_y - section_y] += (
+                mass * inverse_cell_area
+            )
+
+        return
+
+    # Everything that is constant for this particle is hoisted
+    # out of the pixel loops, leaving only multiplications in
+    # the inner loop so that it can be vectorised.
+    inverse_kernel_width = float32(1.0) / float32(kernel_width)
+    kernel_normalisation = (
+        float32(mass) * kernel_norm * inverse_kernel_width * inverse_kernel_width
+    )
+    x_pos_32 = float32(x_pos)
+    y_pos_32 = float32(y_pos)
+
+    # Pixel ranges are relative to the start of the section. Starting the
+    # ranges from max(0, ...) lets the compiler prove that the indices are
+    # non-negative, and hence vectorise the inner loop.
+    min_row_y = max(0, particle_cell_y - cells_spanned - section_y)
+    max_row_y = min(particle_cell_y + cells_spanned + 1 - section_y, section_size_y)
+
+    # Now we loop over the square of cells that the kernel lives in
+    for row_x in range(
+        # Ensure that the lowest x value is within the section, otherwise
+        # we'll segfault
+        max(0, particle_cell_x - cells_spanned - section_x),
+        # Ensure that the highest x value lies within the section bounds,
+        # otherwise we'll segfault (oops).
+        min(particle_cell_x + cells_spanned + 1 - section_x, section_size_x),
+    ):
+        # The distance in x to our new favourite cell -- remember that our x, y
+        # are all in a box of [0, 1]; calculate the distance to the cell centre
+        distance_x = (
+            float32(row_x + section_x) + float32(0.5)
+        ) * pixel_width - x_pos_32
+        distance_x_2 = distance_x * distance_x
+        image_row = image[row_x]
+
+        # Contiguous sweep along the row; this is the Wendland-C2
+        # kernel (see kernels.kernel_single_precision) with the
+        # ratio < 1 branch replaced by clamping 1 - ratio at zero.
+        for row_y in range(min_row_y, max_row_y):
+            distance_y = (
+                float32(row_y + section_y) + float32(0.5)
+            ) * pixel_width - y_pos_32
+
+            ratio = sqrt(distance_x_2 + distance_y * distance_y) * inverse_kernel_width
+
+            one_minus_ratio = max(float32(1.0) - ratio, float32(0.0))
+            one_minus_ratio_2 = one_minus_ratio * one_minus_ratio
+            one_minus_ratio_4 = one_minus_ratio_2 * one_minus_ratio_2
+
+            image_row[row_y] += (
+                kernel_normalisation
+                * one_minus_ratio_4
+                * (float32(1.0) + float32(4.0) * ratio)
+            )
+
+    return
+
+
+@jit(nopython=True, fastmath=True, cache=True)
+def overlapped_cells(x_pos: float64, y_pos: float64, hsml: float32, res: int):
+    """
+    Finds the range of pixels that a particle deposits into
+
+    Parameters
+    ----------
+
+    x_pos : float64
+        x-position of the particle. The image spans [0, 1].
+
+    y_pos : float64
+        y-position of the particle. The image spans [0, 1].
+
+    hsml : float32
+        smoothing length of the particle
+
+    res : int
+        the number of pixels along one axis of the image.
+
+    Returns
+    -------
+
+    first_cell_x, last_cell_x, first_cell_y, last_cell_y : int
+        the (inclusive) range of pixels in x and y that ``deposit`` writes
+        to for this particle. The range is empty (first > last) if the
+        particle does not overlap with the image.
+    """
+    maximal_array_index = int32(res) - 1
+    float_res_64 = float64(res)
+
+    particle_cell_x = int32(float_res_64 * x_pos)
+    particle_cell_y = int32(float_res_64 * y_pos)
+
+    cells_spanned = int32(1.0 + kernel_gamma * hsml * float32(res))
+
+    if cells_spanned <= 1:
+        # Single-cell particles only ever touch their own cell
+        cells_spanned = 0
+
+    return (
+        max(0, particle_cell_x - cells_spanned),
+        min(maximal_array_index, particle_cell_x + cells_spanned),
+        max(0, particle_cell_y - cells_spanned),
+        min(maximal_array_index, particle_cell_y + cells_spanned),
+    )
+
+
+@jit(nopython=True, fastmath=True, cache=True, inline="always")
+def copy_overlapped_cells(copy_index: int, arguments: tuple):
+    """
+    Finds the range of pixels that a periodic copy of a particle deposits
+    into, for binning the copies with ``tile_binner``
+
+    Parameters
+    ----------
+
+    copy_index : int
+        index of the copy, see ``accelerated.periodic_copy``
+
+    arguments : tuple
+        the positions ``x`` and ``y``, smoothing lengths ``h``, resolution
+        ``res`` and box sizes ``box_x`` and ``box_y`` passed to
+        ``scatter_parallel``
+
+    Returns
+    -------
+
+    first_cell_x, last_cell_x, first_cell_y, last_cell_y : int
+        the range of pixels from ``overlapped_cells``, followed by ``0, 0``
+        for the range in z.
+    """
+    x, y, h, res, box_x, box_y = arguments
+    particle, xshift, yshift, _ = periodic_copy(copy_index, box_x, box_y, 0.0)
+
+    first_x, last_x, first_y, last_y = overlapped_cells(
+        x[particle] + xshift * box_x, y[particle] + yshift * box_y, h[particle], res
+    )
+
+    return first_x, last_x, first_y, last_y, 0, 0
+
+
+bin_into_panels = tile_binner(copy_overlapped_cells)
+
+
+@jit(nopython=True, fastmath=True, cache=True)
 def scatter(
     x: float64,
     y: float64,
@@ -92,7 +352,6 @@ def scatter(
     # Change that integer to a float, we know that our x, y are bounded
     # by [0, 1].
     float_res = float32(res)
-    pixel_width = 1.0 / float_res
 
     # We need this for combining with the x_pos and y_pos variables.
     float_res_64 = float64(res)
@@ -115,22 +374,19 @@ def scatter(
 
     for x_pos_original, y_pos_original, mass, hsml in zip(x, y, m, h):
         # loop over periodic copies of this particle
+        # The number of cells that this kernel spans
+        cells_spanned = int32(1.0 + kernel_gamma * hsml * float_res)
+
         for xshift in range(xshift_min, xshift_max):
             for yshift in range(yshift_min, yshift_max):
                 x_pos = x_pos_original + xshift * box_x
                 y_pos = y_pos_original + yshift * box_y
 
-                # Calculate the cell that this particle; use the 64 bit version of the
-                # resolution as this is the same type as the positions
+                # Most periodic copies, and all small kernels, are dealt with
+                # here rather than by the (much longer) deposit.
                 particle_cell_x = int32(float_res_64 * x_pos)
                 particle_cell_y = int32(float_res_64 * y_pos)
 
-                # SWIFT stores hsml as the FWHM.
-                kernel_width = kernel_gamma * hsml
-
-                # The number of cells that this kernel spans
-                cells_spanned = int32(1.0 + kernel_width * float_res)
-
                 if (
                     particle_cell_x + cells_spanned < 0
                     or particle_cell_x - cells_spanned > maximal_array_index
@@ -151,45 +407,119 @@ def scatter(
                         image[particle_cell_x, particle_cell_y] += (
                             mass * inverse_cell_area
                         )
-                else:
-                    # Now we loop over the square of cells that the kernel lives in
-                    for cell_x in range(
-                        # Ensure that the lowest x value is 0, otherwise we'll segfault
-                        max(0, particle_cell_x - cells_spanned),
-                        # Ensure that the highest x value lies within the array bounds,
-                        # otherwise we'll segfault (oops).
-                        min(
-                            particle_cell_x + cells_spanned + 1, maximal_array_index + 1
-                        ),
-                    ):
-                        # The distance in x to our new favourite cell -- remember that our x, y
-                        # are all in a box of [0, 1]; calculate the distance to the cell centre
-                        distance_x = (float32(cell_x) + 0.5) * pixel_width - float32(
-                            x_pos
-                        )
-                        distance_x_2 = distance_x * distance_x
-                        for cell_y in range(
-                            max(0, particle_cell_y - cells_spanned),
-                            min(
-                                particle_cell_y + cells_spanned + 1,
-                                maximal_array_index + 1,
-                            ),
-                        ):
-                            distance_y = (
-                                float32(cell_y) + 0.5
-                            ) * pixel_width - float32(y_pos)
-                            distance_y_2 = distance_y * distance_y
+                    continue
+
+                deposit(image, x_pos, y_pos, mass, hsml, res, 0, 0)
 
-                            r = sqrt(distance_x_2 + distance_y_2)
+    return image
 
-                            kernel_eval = kernel(r, kernel_width)
 
-                            image[cell_x, cell_y] += mass * kernel_eval
+@jit(nopython=True, fastmath=True, parallel=True, cache=True)
+def scatter_panels(
+    x: float64,
+    y: float64,
+    m: float32,
+    h: float32,
+    res: int,
+    box_x: float64,
+    box_y: float64,
+    number_of_threads: int,
+) -> ndarray:
+    """
+    Creates a weighted scatter plot by rendering square panels of the image
+    in parallel
+
+    Parameters
+    ----------
+
+    x, y, m, h, res, box_x, box_y
+        as for ``scatter_parallel``
+
+    number_of_threads : int
+        the number of threads to split the panels between
+
+    Returns
+    -------
+
+    np.array[float32, float32, float32]
+        pixel grid of quantity
+
+    See Also
+    --------
+
+    scatter_parallel : Parallel implementation of scatter
+
+    Notes
+    -----
+
+    The image is split into square panels of at most ``maximal_panel_size``
+    pixels, made smaller for small images so that every thread gets a share
+    of them. The particles (and their periodic copies) are first binned, in
+    parallel, into the panels that they overlap by ``bin_into_panels``, and
+    then each thread renders a range of panels, one at a time, into a small
+    scratch tile that stays in cache. As each pixel belongs to a single
+    panel, no per-thread copies of the full image are required. The
+    particles are deposited into each pixel in the same order as in
+    ``scatter``, but the result may differ from it in the last bit, as the
+    pixel positions are computed relative to the panel.
+    """
+    maximal_array_index = int32(res) - 1
+    panel_size = tile_size(res, maximal_panel_size, 2, number_of_threads)
+    panels_per_side = (res + panel_size - 1) // panel_size
+
+    panel_offsets, panel_copies, panel_cost = bin_into_panels(
+        x.size * periodic_copies(box_x, box_y, 0.0),
+        panel_size,
+        panels_per_side,
+        2,
+        number_of_threads,
+        (x, y, h, res, box_x, box_y),
+    )
+
+    # Split the panels between threads such that each thread computes
+    # roughly the same number of pixels.
+    thread_edges = balanced_ranges(panel_cost, number_of_threads)
+
+    image = zeros((res, res), dtype=float32)
+
+    for thread in prange(number_of_threads):
+        # Each thread re-uses a single scratch buffer for all of its panels
+        tile = zeros(panel_size * panel_size, dtype=float32)
+
+        for panel in range(thread_edges[thread], thread_edges[thread + 1]):
+            first_cell_x = (panel // panels_per_side) * panel_size
+            first_cell_y = (panel % panels_per_side) * panel_size
+            size_x = min(panel_size, maximal_array_index + 1 - first_cell_x)
+            size_y = min(panel_size, maximal_array_index + 1 - first_cell_y)
+
+            # Reshaping the front of the buffer keeps the tile contiguous
+            panel_tile = tile[: size_x * size_y].reshape((size_x, size_y))
+            panel_tile[:, :] = 0.0
+
+            for index in range(panel_offsets[panel], panel_offsets[panel + 1]):
+                particle, xshift, yshift, _ = periodic_copy(
+                    panel_copies[index], box_x, box_y, 0.0
+                )
+
+                deposit(
+                    panel_tile,
+                    x[particle] + xshift * box_x,
+                    y[particle] + yshift * box_y,
+                    m[particle],
+                    h[particle],
+                    res,
+                    first_cell_x,
+                    first_cell_y,
+                )
+
+            image[
+                first_cell_x : first_cell_x + size_x,
+                first_cell_y : first_cell_y + size_y,
+            ] = panel_tile
 
     return image
 
 
-@jit(nopython=True, fastmath=True, parallel=True)
 def scatter_parallel(
     x: float64,
     y: float64,
@@ -243,41 +573,19 @@ def scatter_parallel(
     --------
 
     scatter : Creates 2D scatter plot from SWIFT data
+    scatter_panels : Creates 2D scatter plot from SWIFT data in panels
 
     Notes
     -----
 
-    Explicitly defining the types in this function allows
-    for a 25-50% performance improvement. In our testing, using numpy
-    floats and integers is also an improvement over using the numba ones.
-
+    This renders the image with ``scatter_panels`` using numba's current
+    number of threads. With a single thread there is nothing to share out,
+    and binning the particles into panels would only add to the work of
+    ``scatter``, so that is called instead.
     """
+    number_of_threads = get_num_threads()
 
-    number_of_particles = x.size
-    core_particles = number_of_particles // NUM_THREADS
-
-    output = zeros((res, res), dtype=float32)
-
-    for thread in prange(NUM_THREADS):
-        # Left edge is easy, just start at 0 and go to 'final'
-        left_edge = thread * core_particles
-
-        # Right edge is harder in case of left over particles...
-        right_edge = thread + 1
-
-        if right_edge == NUM_THREADS:
-            right_edge = number_of_particles
-        else:
-            right_edge *= core_particles
-
-        output += scatter(
-            x=x[left_edge:right_edge],
-            y=y[left_edge:right_edge],
-            m=m[left_edge:right_edge],
-            h=h[left_edge:right_edge],
-            res=res,
-            box_x=box_x,
-            box_y=box_y,
-        )
+    if number_of_threads == 1:
+        return scatter(x, y, m, h, res, box_x, box_y)
 
-    return output
+    return scatter_panels(x, y, m, h, res, box_x, box_y, number_of_threads)
@@ -1,5 +1,5 @@
 from math import sqrt, ceil
-from numpy import float64, float32, int32, ndarray
+from numpy import float64, float32, int32, ndarray, zeros
 from swiftsimio.optional_packages import (
     CUDA_AVAILABLE,
     cuda_jit,
@@ -48,16 +48,14 @@ def kernel(r: float32, H: float32):
     inverse_H = 1.0 / H
     ratio = r * inverse_H
 
-    kernel = 0.0
+    # Clamp outside of the support rather than branching, so that all of
+    # the threads in a warp follow the same path.
+    one_minus_ratio = max(1.0 - ratio, 0.0)
+    one_minus_ratio_2 = one_minus_ratio * one_minus_ratio
+    one_minus_ratio_4 = one_minus_ratio_2 * one_minus_ratio_2
 
-    if ratio < 1.0:
-        one_minus_ratio = 1.0 - ratio
-        one_minus_ratio_2 = one_minus_ratio * one_minus_ratio
-        one_minus_ratio_4 = one_minus_ratio_2 * one_minus_ratio_2
-
-        kernel = max(one_minus_ratio_4 * (1.0 + 4.0 * ratio), 0.0)
-
-        kernel *= kernel_constant * inverse_H * inverse_H
+    kernel = one_minus_ratio_4 * (1.0 + 4.0 * ratio)
+    kernel *= kernel_constant * inverse_H * inverse_H
 
     return kernel
 
@@ -268,10 +266,14 @@ def scatter(
             "is only available on systems with supported GPUs."
         )
 
+    n_part = len(x)
+    if n_part == 0:
+        # An empty grid can't be launched
+        return zeros((res, res), dtype=float32)
+
     output = cuda.device_array((res, res), dtype=float32)
     output[:] = 0
 
-    n_part = len(x)
     if box_x == 0.0:
         n_xshift = 1
     else:
@@ -12,7 +12,7 @@ from numpy import float32, float64, int32, zeros, ndarray
 from swiftsimio.accelerated import jit, NUM_THREADS, prange
 
 
-@jit(nopython=True, fastmath=True)
+@jit(nopython=True, fastmath=True, cache=True)
 def scatter(
     x: float64,
     y: float64,
@@ -123,7 +123,7 @@ def scatter(
     return image
 
 
-@jit(nopython=True, fastmath=True, parallel=True)
+@jit(nopython=True, fastmath=True, parallel=True, cache=True)
 def scatter_parallel(
     x: float64,
     y: float64,
@@ -4,7 +4,7 @@ Projection kernels.
 
 from typing import Union
 from math import sqrt
-from numpy import float64, float32, int32
+from numpy import float64, float32, int32, ndarray, maximum
 
 from swiftsimio.accelerated import jit, NUM_THREADS, prange
 
@@ -13,7 +13,7 @@ kernel_gamma = float32(1.897367)
 kernel_constant = float32(7.0 / 3.14159)
 
 
-@jit("float32(float32, float32)", nopython=True, fastmath=True)
+@jit("float32(float32, float32)", nopython=True, fastmath=True, cache=True)
 def kernel_single_precision(r: float32, H: float32):
     """
     Single precision kernel implementation for swiftsimio.
@@ -50,21 +50,19 @@ def kernel_single_precision(r: float32, H: float32):
     inverse_H = 1.0 / H
     ratio = r * inverse_H
 
-    kernel = 0.0
+    # Clamping outside of the support, rather than branching on it, lets
+    # the compiler vectorise the loops that this kernel is inlined into.
+    one_minus_ratio = max(1.0 - ratio, 0.0)
+    one_minus_ratio_2 = one_minus_ratio * one_minus_ratio
+    one_minus_ratio_4 = one_minus_ratio_2 * one_minus_ratio_2
 
-    if ratio < 1.0:
-        one_minus_ratio = 1.0 - ratio
-        one_minus_ratio_2 = one_minus_ratio * one_minus_ratio
-        one_minus_ratio_4 = one_minus_ratio_2 * one_minus_ratio_2
-
-        kernel = max(one_minus_ratio_4 * (1.0 + 4.0 * ratio), 0.0)
-
-        kernel *= kernel_constant * inverse_H * inverse_H
+    kernel = one_minus_ratio_4 * (1.0 + 4.0 * ratio)
+    kernel *= kernel_constant * inverse_H * inverse_H
 
     return kernel
 
 
-@jit("float64(float64, float64)", nopython=True, fastmath=True)
+@jit("float64(float64, float64)", nopython=True, fastmath=True, cache=True)
 def kernel_double_precision(r: float64, H: float64):
     """
     Single precision kernel implementation for swiftsimio.
@@ -100,15 +98,58 @@ def kernel_double_precision(r: float64, H: float64):
     inverse_H = 1.0 / H
     ratio = r * inverse_H
 
-    kernel = 0.0
+    # Clamping outside of the support, rather than branching on it, lets
+    # the compiler vectorise the loops that this kernel is inlined into.
+    one_minus_ratio = max(1.0 - ratio, 0.0)
+    one_minus_ratio_2 = one_minus_ratio * one_minus_ratio
+    one_minus_ratio_4 = one_minus_ratio_2 * one_minus_ratio_2
 
-    if ratio < 1.0:
-        one_minus_ratio = 1.0 - ratio
-        one_minus_ratio_2 = one_minus_ratio * one_minus_ratio
-        one_minus_ratio_4 = one_minus_ratio_2 * one_minus_ratio_2
+    kernel = one_minus_ratio_4 * (1.0 + 4.0 * ratio)
+    kernel *= kernel_constant * inverse_H * inverse_H
 
-        kernel = max(one_minus_ratio_4 * (1.0 + 4.0 * ratio), 0.0)
+    return kernel
 
-        kernel *= kernel_constant * inverse_H * inverse_H
 
-    return kernel
+def kernel_single_precision_vectorised(r: ndarray, H: ndarray) -> ndarray:
+    """
+    Vectorised single precision kernel implementation for swiftsimio.
+
+    This is the Wendland-C2 kernel as shown in Denhen & Aly (2012) [3]_,
+    evaluated element-wise over arrays with ``numpy`` rather than ``numba``.
+
+    Parameters
+    ----------
+
+    r : np.array[float32]
+        radii used in kernel computation
+
+    H : np.array[float32]
+        kernel widths (i.e. radius of compact support for the kernel)
+
+    Returns
+    -------
+
+    np.array[float32]
+        Contribution to the density by the particles
+
+    See Also
+    --------
+
+    kernel_single_precision
+
+    References
+    ----------
+
+    .. [3] Dehnen W., Aly H., 2012, MNRAS, 425, 1068
+    """
+    inverse_H = float32(1.0) / H
+    ratio = r * inverse_H
+
+    one_minus_ratio = maximum(float32(1.0) - ratio, float32(0.0))
+    one_minus_ratio_2 = one_minus_ratio * one_minus_ratio
+    one_minus_ratio_4 = one_minus_ratio_2 * one_minus_ratio_2
+
+    kernel = one_minus_ratio_4 * (float32(1.0) + float32(4.0) * ratio)
+    kernel *= kernel_constant * inverse_H * inverse_H
+
+    return kernel.astype(float32, copy=False)
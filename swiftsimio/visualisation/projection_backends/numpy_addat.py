@@ -0,0 +1,271 @@
+"""
+Pure numpy backend.
+
+This is the same smoothing as the fast backend (float32 precision, no
+special cases), but written with vectorised numpy operations instead of
+numba loops. Contributions are accumulated with ``np.add.at``, which
+(unlike fancy-indexed ``+=``) correctly sums repeated pixel indices.
+"""
+
+
+from functools import lru_cache
+from typing import Tuple
+from numpy import (
+    float64,
+    float32,
+    int32,
+    zeros,
+    ndarray,
+    array,
+    argsort,
+    arange,
+    concatenate,
+    repeat,
+    tile,
+    searchsorted,
+    ravel_multi_index,
+    add,
+    sqrt,
+)
+
+from swiftsimio.visualisation.projection_backends.kernels import (
+    kernel_single_precision_vectorised as kernel,
+)
+from swiftsimio.visualisation.projection_backends.kernels import kernel_gamma
+
+
+@lru_cache(maxsize=256)
+def ring_offsets(radius: int) -> Tuple[ndarray, ndarray]:
+    """
+    Offsets of all cells lying on the square ring at Chebyshev distance
+    ``radius`` from the origin.
+
+    Parameters
+    ----------
+
+    radius : int
+        the distance (in cells) of the ring from the central cell.
+
+    Returns
+    -------
+
+    offset_x, offset_y : np.array[int32]
+        the x and y offsets of the cells on the ring. These are cached, and
+        hence shared between calls, so are read-only.
+    """
+    if radius == 0:
+        offset_x = zeros(1, dtype=int32)
+        offset_y = zeros(1, dtype=int32)
+        offset_x.flags.writeable = False
+        offset_y.flags.writeable = False
+
+        return offset_x, offset_y
+
+    side = arange(-radius, radius + 1, dtype=int32)
+    inner = arange(-radius + 1, radius, dtype=int32)
+
+    offset_x = concatenate(
+        [
+            side,
+            side,
+            repeat(int32(-radius), inner.size),
+            repeat(int32(radius), inner.size),
+        ]
+    )
+    offset_y = concatenate(
+        [
+            repeat(int32(-radius), side.size),
+            repeat(int32(radius), side.size),
+            inner,
+            inner,
+        ]
+    )
+
+    offset_x.flags.writeable = False
+    offset_y.flags.writeable = False
+
+    return offset_x, offset_y
+
+
+def scatter(
+    x: float64,
+    y: float64,
+    m: float32,
+    h: float32,
+    res: int,
+    box_x: float64 = 0.0,
+    box_y: float64 = 0.0,
+) -> ndarray:
+    """
+    Creates a weighted scatter plot
+
+    Computes contributions to from particles with positions
+    (`x`,`y`) with smoothing lengths `h` weighted by quantities `m`.
+    This includes periodic boundary effects.
+
+    Parameters
+    ----------
+
+    x : np.array[float64]
+        array of x-positions of the particles. Must be bounded by [0, 1].
+
+    y : np.array[float64]
+        array of y-positions of the particles. Must be bounded by [0, 1].
+
+    m : np.array[float32]
+        array of masses (or otherwise weights) of the particles
+
+    h : np.array[float32]
+        array of smoothing lengths of the particles
+
+    res : int
+        the number of pixels along one axis, i.e. this returns a square
+        of res * res.
+
+    box_x: float64
+        box size in x, in the same rescaled length units as x and y. Used
+        for periodic wrapping.
+
+    box_y: float64
+        box size in y, in the same rescaled length units as x and y. Used
+        for periodic wrapping.
+
+    Returns
+    -------
+
+    np.array[float32, float32, float32]
+        pixel grid of quantity
+
+    See Also
+    --------
+
+    scatter_parallel : Parallel implementation of this function
+
+    Notes
+    -----
+
+    Rather than looping over particles, this loops over the rings of
+    cells around each particle's central cell, treating all particles
+    whose kernel reaches that ring at once. Particles are sorted by the
+    number of cells they span so that each ring only touches the particles
+    that contribute to it.
+    """
+    # Flattened output array for our image, so that we can use add.at
+    image = zeros(res * res, dtype=float32)
+    maximal_array_index = int32(res) - 1
+    image_shape = (res, res)
+
+    float_res = float32(res)
+    pixel_width = float32(1.0) / float_res
+
+    # We need this for combining with the x_pos and y_pos variables.
+    float_res_64 = float64(res)
+
+    # Pre-calculate this constant for use with the above
+    inverse_cell_area = float32(res * res)
+
+    xshifts = array([0.0]) if box_x == 0.0 else array([-1.0, 0.0, 1.0])
+    yshifts = array([0.0]) if box_y == 0.0 else array([-1.0, 0.0, 1.0])
+
+    # Create all periodic copies of all particles up-front, ordered by
+    # particle and then by shift in x and y.
+    number_of_shifts = xshifts.size * yshifts.size
+    xshift_all = repeat(xshifts, yshifts.size) * box_x
+    yshift_all = tile(yshifts, xshifts.size) * box_y
+
+    x_pos = (x.reshape(-1, 1) + xshift_all).ravel()
+    y_pos = (y.reshape(-1, 1) + yshift_all).ravel()
+    mass = repeat(m.astype(float32), number_of_shifts)
+    hsml = repeat(h.astype(float32), number_of_shifts)
+
+    # Calculate the cell that each particle lives in; use the 64 bit version
+    # of the resolution as this is the same type as the positions
+    particle_cell_x = (float_res_64 * x_pos).astype(int32)
+    particle_cell_y = (float_res_64 * y_pos).astype(int32)
+
+    # SWIFT stores hsml as the FWHM.
+    kernel_width = kernel_gamma * hsml
+
+    # The number of cells that each kernel spans
+    cells_spanned = (1.0 + kernel_width * float_res).astype(int32)
+
+    overlaps = ~(
+        (particle_cell_x + cells_spanned < 0)
+        | (particle_cell_x - cells_spanned > maximal_array_index)
+        | (particle_cell_y + cells_spanned < 0)
+        | (particle_cell_y - cells_spanned > maximal_array_index)
+    )
+
+    # Particles smaller than a cell are simply binned into their own cell
+    single_cell = (
+        overlaps
+        & (cells_spanned <= 1)
+        & (particle_cell_x >= 0)
+        & (particle_cell_x <= maximal_array_index)
+        & (particle_cell_y >= 0)
+        & (particle_cell_y <= maximal_array_index)
+    )
+
+    add.at(
+        image,
+        ravel_multi_index(
+            (particle_cell_x[single_cell], particle_cell_y[single_cell]), image_shape
+        ),
+        mass[single_cell] * inverse_cell_area,
+    )
+
+    # Now deal with the particles that span many cells, largest first.
+    spread = overlaps & (cells_spanned > 1)
+    order = argsort(-cells_spanned[spread], kind="stable")
+
+    x_pos = x_pos[spread][order].astype(float32)
+    y_pos = y_pos[spread][order].astype(float32)
+    mass = mass[spread][order]
+    kernel_width = kernel_width[spread][order]
+    particle_cell_x = particle_cell_x[spread][order]
+    particle_cell_y = particle_cell_y[spread][order]
+    cells_spanned = cells_spanned[spread][order]
+
+    if cells_spanned.size == 0:
+        return image.reshape(image_shape)
+
+    # Number of (sorted) particles that reach out to at least each radius
+    reaching = searchsorted(-cells_spanned, -arange(cells_spanned[0] + 1), side="right")
+
+    for radius in range(cells_spanned[0] + 1):
+        active = reaching[radius]
+        offset_x, offset_y = ring_offsets(radius)
+
+        cell_x = particle_cell_x[:active].reshape(-1, 1) + offset_x
+        cell_y = particle_cell_y[:active].reshape(-1, 1) + offset_y
+
+        in_image = (
+            (cell_x >= 0)
+            & (cell_x <= maximal_array_index)
+            & (cell_y >= 0)
+            & (cell_y <= maximal_array_index)
+        )
+
+        # The distance to the cell centres -- remember that our x, y
+        # are all in a box of [0, 1]
+        distance_x = (cell_x.astype(float32) + float32(0.5)) * pixel_width
+        distance_x -= x_pos[:active].reshape(-1, 1)
+        distance_y = (cell_y.astype(float32) + float32(0.5)) * pixel_width
+        distance_y -= y_pos[:active].reshape(-1, 1)
+
+        r = sqrt(distance_x * distance_x + distance_y * distance_y)
+
+        kernel_eval = kernel(r, kernel_width[:active].reshape(-1, 1))
+
+        add.at(
+            image,
+            ravel_multi_index((cell_x[in_image], cell_y[in_image]), image_shape),
+            (mass[:active].reshape(-1, 1) * kernel_eval)[in_image],
+        )
+
+    return image.reshape(image_shape)
+
+
+# There is no thread-level parallelism in numpy, so the parallel
+# implementation is the same function as the non-parallel.
+scatter_parallel = scatter
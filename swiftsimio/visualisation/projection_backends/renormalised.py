@@ -17,18 +17,15 @@ from typing import Union
 from math import sqrt
 from numpy import float64, float32, int32, zeros, ndarray
 
-from swiftsimio.accelerated import jit, NUM_THREADS, prange
+from swiftsimio.accelerated import jit, NUM_THREADS, prange, balanced_ranges
 
 from swiftsimio.visualisation.projection_backends.kernels import (
     kernel_single_precision as kernel,
 )
-from swiftsimio.visualisation.projection_backends.kernels import (
-    kernel_constant,
-    kernel_gamma,
-)
+from swiftsimio.visualisation.projection_backends.kernels import kernel_gamma
 
 
-@jit(nopython=True, fastmath=True)
+@jit(nopython=True, fastmath=True, cache=True)
 def scatter(
     x: float64,
     y: float64,
@@ -227,7 +224,7 @@ def scatter(
     return image
 
 
-@jit(nopython=True, fastmath=True, parallel=True)
+@jit(nopython=True, fastmath=True, parallel=True, cache=True)
 def scatter_parallel(
     x: float64,
     y: float64,
@@ -292,22 +289,17 @@ def scatter_parallel(
     # Same as scatter, but executes in parallel! This is actually trivial,
     # we just make NUM_THREADS images and add them together at the end.
 
-    number_of_particles = x.size
-    core_particles = number_of_particles // NUM_THREADS
+    # Split the particles between threads such that each thread evaluates
+    # roughly the same number of kernels, rather than the same number of
+    # particles, as the cost of each particle scales with its kernel's area.
+    cells_spanned = 1.0 + kernel_gamma * h * float32(res)
+    thread_edges = balanced_ranges((2.0 * cells_spanned + 1.0) ** 2, NUM_THREADS)
 
     output = zeros((res, res), dtype=float32)
 
     for thread in prange(NUM_THREADS):
-        # Left edge is easy, just start at 0 and go to 'final'
-        left_edge = thread * core_particles
-
-        # Right edge is harder in case of left over particles...
-        right_edge = thread + 1
-
-        if right_edge == NUM_THREADS:
-            right_edge = number_of_particles
-        else:
-            right_edge *= core_particles
+        left_edge = thread_edges[thread]
+        right_edge = thread_edges[thread + 1]
 
         output += scatter(
             x=x[left_edge:right_edge],
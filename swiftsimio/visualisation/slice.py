@@ -15,20 +15,35 @@ from numpy import (
     ones,
     isclose,
     matmul,
+    ascontiguousarray,
     copy,
 )
 from unyt import unyt_array, unyt_quantity
 import unyt
 from swiftsimio import SWIFTDataset, cosmo_array
 
-from swiftsimio.accelerated import jit, prange, NUM_THREADS
+from swiftsimio.accelerated import (
+    jit,
+    prange,
+    get_num_threads,
+    balanced_ranges,
+    tile_size,
+    tile_binner,
+    periodic_copies,
+    periodic_copy,
+)
 
 # Taken from Dehnen & Aly 2012
 kernel_gamma = 1.936492
 kernel_constant = 21.0 * 0.31830988618379067154 / 2.0
 
+# Largest side length, in pixels, of the square panels that
+# slice_scatter_panels splits the image into. A float32 panel fits in L1
+# cache.
+maximal_panel_size = 64
+
 
-@jit(nopython=True, fastmath=True)
+@jit(nopython=True, fastmath=True, cache=True)
 def kernel(r: Union[float, float32], H: Union[float, float32]):
     """
     Kernel implementation for swiftsimio.
@@ -58,21 +73,212 @@ def kernel(r: Union[float, float32], H: Union[float, float32]):
     inverse_H = 1.0 / H
     ratio = r * inverse_H
 
-    kernel = 0.0
+    # No branch on the support here, so that slice_scatter's pixel loop
+    # can be vectorised; the clamp zeroes the kernel for ratio >= 1.
+    one_minus_ratio = max(1.0 - ratio, 0.0)
+    one_minus_ratio_2 = one_minus_ratio * one_minus_ratio
+    one_minus_ratio_4 = one_minus_ratio_2 * one_minus_ratio_2
 
-    if ratio < 1.0:
-        one_minus_ratio = 1.0 - ratio
-        one_minus_ratio_2 = one_minus_ratio * one_minus_ratio
-        one_minus_ratio_4 = one_minus_ratio_2 * one_minus_ratio_2
+    kernel = one_minus_ratio_4 * (1.0 + 4.0 * ratio)
+    kernel *= kernel_constant * inverse_H * inverse_H * inverse_H
 
-        kernel = max(one_minus_ratio_4 * (1.0 + 4.0 * ratio), 0.0)
+    return kernel
 
-        kernel *= kernel_constant * inverse_H * inverse_H * inverse_H
 
-    return kernel
+@jit(nopython=True, fastmath=True, cache=True)
+def overlapped_cells(
+    x_pos: float64, y_pos: float64, distance_z_2: float64, hsml: float32, res: int
+):
+    """
+    Finds the range of pixels that a particle deposits into
+
+    Parameters
+    ----------
+    x_pos : float64
+        x-position of the particle. The image spans [0, 1].
+    y_pos : float64
+        y-position of the particle. The image spans [0, 1].
+    distance_z_2 : float64
+        square of the distance between the particle and the slice
+    hsml : float32
+        smoothing length of the particle
+    res : int
+        the number of pixels along one axis of the image.
+
+    Returns
+    -------
+    first_cell_x, last_cell_x, first_cell_y, last_cell_y : int
+        the (inclusive) range of pixels in x and y that ``deposit`` writes
+        to for this particle. The range is empty (first > last) if the
+        particle does not overlap with the slice.
+    """
+    maximal_array_index = int32(res) - 1
+
+    particle_cell_x = int32(float64(res) * x_pos)
+    particle_cell_y = int32(float64(res) * y_pos)
+
+    kernel_width = kernel_gamma * hsml
+    cells_spanned = int32(1.0 + kernel_width * float32(res))
+
+    if distance_z_2 > (kernel_width * kernel_width):
+        return 0, -1, 0, -1
+
+    return (
+        max(0, particle_cell_x - cells_spanned),
+        min(maximal_array_index, particle_cell_x + cells_spanned - 1),
+        max(0, particle_cell_y - cells_spanned),
+        min(maximal_array_index, particle_cell_y + cells_spanned - 1),
+    )
+
+
+@jit(nopython=True, fastmath=True, cache=True)
+def deposit(
+    image: ndarray,
+    x_pos: float64,
+    y_pos: float64,
+    distance_z_2: float64,
+    mass: float32,
+    hsml: float32,
+    res: int,
+    first_cell_x: int,
+    first_cell_y: int,
+):
+    """
+    Deposits a single particle into a section of the slice
+
+    Parameters
+    ----------
+    image : ndarray of float32
+        the section of the image to deposit into; this covers the pixels
+        ``first_cell_x`` to ``first_cell_x + image.shape[0]`` in x (and
+        correspondingly in y) of the full `res` * `res` image.
+    x_pos : float64
+        x-position of the particle. The full image spans [0, 1].
+    y_pos : float64
+        y-position of the particle. The full image spans [0, 1].
+    distance_z_2 : float64
+        square of the distance between the particle and the slice
+    mass : float32
+        mass (or otherwise weight) of the particle
+    hsml : float32
+        smoothing length of the particle
+    res : int
+        the number of pixels along one axis of the full image.
+    first_cell_x : int
+        the x index, in the full image, of the first pixel of the section.
+    first_cell_y : int
+        the y index, in the full image, of the first pixel of the section.
+
+    See Also
+    --------
+    slice_scatter : Create scatter plot of a slice of data
+    """
+    section_x = int32(first_cell_x)
+    section_y = int32(first_cell_y)
+    section_size_x = int32(image.shape[0])
+    section_size_y = int32(image.shape[1])
+
+    # Change that integer to a float, we know that our x, y are bounded
+    # by [0, 1].
+    float_res = float32(res)
+    pixel_width = 1.0 / float_res
+
+    # We need this for combining with the x_pos and y_pos variables.
+    float_res_64 = float64(res)
+
+    # Calculate the cell that this particle lives above; use 64 bits
+    # resolution as this is the same type as the positions
+    particle_cell_x = int32(float_res_64 * x_pos)
+    particle_cell_y = int32(float_res_64 * y_pos)
+
+    # SWIFT stores hsml as the FWHM.
+    kernel_width = kernel_gamma * hsml
+    # The number of cells that this kernel spans
+    cells_spanned = int32(1.0 + kernel_width * float_res)
+
+    if (
+        # No overlap in z
+        distance_z_2 > (kernel_width * kernel_width)
+        # No overlap in x, y
+        or particle_cell_x + cells_spanned < section_x
+        or particle_cell_x - cells_spanned >= section_x + section_size_x
+        or particle_cell_y + cells_spanned < section_y
+        or particle_cell_y - cells_spanned >= section_y + section_size_y
+    ):
+        # We have no overlap, we can skip this particle.
+        return
+
+    # Now we loop over the square of cells that the kernel lives in; all
+    # ranges are relative to the start of the section, and are clipped to it
+    # so that we don't segfault.
+    min_row_y = max(0, particle_cell_y - cells_spanned - section_y)
+    max_row_y = min(particle_cell_y + cells_spanned - section_y, section_size_y)
+
+    for row_x in range(
+        max(0, particle_cell_x - cells_spanned - section_x),
+        min(particle_cell_x + cells_spanned - section_x, section_size_x),
+    ):
+        # The distance in x to our new favourite cell -- remember that our x, y
+        # are all in a box of [0, 1]; calculate the distance to the cell centre
+        distance_x = (float32(row_x + section_x) + 0.5) * pixel_width - float32(x_pos)
+        distance_x_2 = distance_x * distance_x
+        image_row = image[row_x]
+        for row_y in range(min_row_y, max_row_y):
+            distance_y = (float32(row_y + section_y) + 0.5) * pixel_width - float32(
+                y_pos
+            )
+            distance_y_2 = distance_y * distance_y
+
+            r = sqrt(distance_x_2 + distance_y_2 + distance_z_2)
+
+            kernel_eval = kernel(r, kernel_width)
+
+            image_row[row_y] += mass * kernel_eval
+
+    return
+
+
+@jit(nopython=True, fastmath=True, cache=True, inline="always")
+def copy_overlapped_cells(copy_index: int, arguments: tuple):
+    """
+    Finds the range of pixels that a periodic copy of a particle deposits
+    into, for binning the copies with ``tile_binner``
+
+    Parameters
+    ----------
+    copy_index : int
+        index of the copy, see ``accelerated.periodic_copy``
+    arguments : tuple
+        the positions ``x``, ``y`` and ``z``, smoothing lengths ``h``, slice
+        position ``z_slice``, resolution ``res`` and box sizes ``box_x``,
+        ``box_y`` and ``box_z`` passed to ``slice_scatter_parallel``
+
+    Returns
+    -------
+    first_cell_x, last_cell_x, first_cell_y, last_cell_y : int
+        the range of pixels from ``overlapped_cells``, followed by ``0, 0``
+        for the range in z.
+    """
+    x, y, z, h, z_slice, res, box_x, box_y, box_z = arguments
+    particle, xshift, yshift, zshift = periodic_copy(copy_index, box_x, box_y, box_z)
+
+    distance_z = z[particle] + zshift * box_z - z_slice
+
+    first_x, last_x, first_y, last_y = overlapped_cells(
+        x[particle] + xshift * box_x,
+        y[particle] + yshift * box_y,
+        distance_z * distance_z,
+        h[particle],
+        res,
+    )
+
+    return first_x, last_x, first_y, last_y, 0, 0
+
 
+bin_into_panels = tile_binner(copy_overlapped_cells)
 
-@jit(nopython=True, fastmath=True)
+
+@jit(nopython=True, fastmath=True, cache=True)
 def slice_scatter(
     x: float64,
     y: float64,
@@ -133,15 +339,6 @@ def slice_scatter(
     """
     # Output array for our image
     image = zeros((res, res), dtype=float32)
-    maximal_array_index = int32(res) - 1
-
-    # Change that integer to a float, we know that our x, y are bounded
-    # by [0, 1].
-    float_res = float32(res)
-    pixel_width = 1.0 / float_res
-
-    # We need this for combining with the x_pos and y_pos variables.
-    float_res_64 = float64(res)
 
     if box_x == 0.0:
         xshift_min = 0
@@ -165,75 +362,139 @@ def slice_scatter(
     for x_pos_original, y_pos_original, z_pos_original, mass, hsml in zip(
         x, y, z, m, h
     ):
+        # SWIFT stores hsml as the FWHM.
+        kernel_width = kernel_gamma * hsml
+
         # loop over periodic copies of the particle
         for xshift in range(xshift_min, xshift_max):
             for yshift in range(yshift_min, yshift_max):
                 for zshift in range(zshift_min, zshift_max):
-                    x_pos = x_pos_original + xshift * box_x
-                    y_pos = y_pos_original + yshift * box_y
-                    z_pos = z_pos_original + zshift * box_z
-
-                    # Calculate the cell that this particle lives above; use 64 bits
-                    # resolution as this is the same type as the positions
-                    particle_cell_x = int32(float_res_64 * x_pos)
-                    particle_cell_y = int32(float_res_64 * y_pos)
-
                     # This is a constant for this particle
-                    distance_z = z_pos - z_slice
+                    distance_z = z_pos_original + zshift * box_z - z_slice
                     distance_z_2 = distance_z * distance_z
 
-                    # SWIFT stores hsml as the FWHM.
-                    kernel_width = kernel_gamma * hsml
-                    # The number of cells that this kernel spans
-                    cells_spanned = int32(1.0 + kernel_width * float_res)
-
-                    if (
-                        # No overlap in z
-                        distance_z_2 > (kernel_width * kernel_width)
-                        # No overlap in x, y
-                        or particle_cell_x + cells_spanned < 0
-                        or particle_cell_x - cells_spanned > maximal_array_index
-                        or particle_cell_y + cells_spanned < 0
-                        or particle_cell_y - cells_spanned > maximal_array_index
-                    ):
-                        # We have no overlap, we can skip this particle.
+                    if distance_z_2 > (kernel_width * kernel_width):
+                        # Most copies do not intersect the slice at all
                         continue
 
-                    # Now we loop over the square of cells that the kernel lives in
-                    for cell_x in range(
-                        # Ensure that the lowest x value is 0, otherwise we'll segfault
-                        max(0, particle_cell_x - cells_spanned),
-                        # Ensure that the highest x value lies within the array bounds,
-                        # otherwise we'll segfault (oops).
-                        min(particle_cell_x + cells_spanned, maximal_array_index + 1),
-                    ):
-                        # The distance in x to our new favourite cell -- remember that our x, y
-                        # are all in a box of [0, 1]; calculate the distance to the cell centre
-                        distance_x = (float32(cell_x) + 0.5) * pixel_width - float32(
-                            x_pos
-                        )
-                        distance_x_2 = distance_x * distance_x
-                        for cell_y in range(
-                            max(0, particle_cell_y - cells_spanned),
-                            min(
-                                particle_cell_y + cells_spanned, maximal_array_index + 1
-                            ),
-                        ):
-                            distance_y = (
-                                float32(cell_y) + 0.5
-                            ) * pixel_width - float32(y_pos)
-                            distance_y_2 = distance_y * distance_y
-
-                            r = sqrt(distance_x_2 + distance_y_2 + distance_z_2)
-
-                            kernel_eval = kernel(r, kernel_width)
-
-                            image[cell_x, cell_y] += mass * kernel_eval
+                    deposit(
+                        image,
+                        x_pos_original + xshift * box_x,
+                        y_pos_original + yshift * box_y,
+                        distance_z_2,
+                        mass,
+                        hsml,
+                        res,
+                        0,
+                        0,
+                    )
+
+    return image
+
+
+@jit(nopython=True, fastmath=True, parallel=True, cache=True)
+def slice_scatter_panels(
+    x: float64,
+    y: float64,
+    z: float64,
+    m: float32,
+    h: float32,
+    z_slice: float64,
+    res: int,
+    box_x: float64,
+    box_y: float64,
+    box_z: float64,
+    number_of_threads: int,
+) -> ndarray:
+    """
+    Creates a scatter plot of a slice by rendering square panels of the
+    image in parallel
+
+    Parameters
+    ----------
+    x, y, z, m, h, z_slice, res, box_x, box_y, box_z
+        as for ``slice_scatter_parallel``
+    number_of_threads : int
+        the number of threads to split the panels between
+
+    Returns
+    -------
+    ndarray of float32
+        output array for scatterplot image
+
+    See Also
+    --------
+    slice_scatter_parallel : Create scatter plot of a slice of data in parallel
+
+    Notes
+    -----
+    The image is split into square panels of at most ``maximal_panel_size``
+    pixels, made smaller for small images so that every thread gets a share
+    of them. The particle copies that intersect the slice are binned, in
+    parallel, into the panels that they overlap by ``bin_into_panels``, and
+    each thread then renders a range of panels into a small scratch tile;
+    see ``projection_backends.fast.scatter_panels``.
+    """
+    maximal_array_index = int32(res) - 1
+    panel_size = tile_size(res, maximal_panel_size, 2, number_of_threads)
+    panels_per_side = (res + panel_size - 1) // panel_size
+
+    panel_offsets, panel_copies, panel_cost = bin_into_panels(
+        x.size * periodic_copies(box_x, box_y, box_z),
+        panel_size,
+        panels_per_side,
+        2,
+        number_of_threads,
+        (x, y, z, h, z_slice, res, box_x, box_y, box_z),
+    )
+
+    # Split the panels between threads such that each thread computes
+    # roughly the same number of pixels.
+    thread_edges = balanced_ranges(panel_cost, number_of_threads)
+
+    image = zeros((res, res), dtype=float32)
+
+    for thread in prange(number_of_threads):
+        # Each thread re-uses a single scratch buffer for all of its panels
+        tile = zeros(panel_size * panel_size, dtype=float32)
+
+        for panel in range(thread_edges[thread], thread_edges[thread + 1]):
+            first_cell_x = (panel // panels_per_side) * panel_size
+            first_cell_y = (panel % panels_per_side) * panel_size
+            size_x = min(panel_size, maximal_array_index + 1 - first_cell_x)
+            size_y = min(panel_size, maximal_array_index + 1 - first_cell_y)
+
+            # Reshaping the front of the buffer keeps the tile contiguous
+            panel_tile = tile[: size_x * size_y].reshape((size_x, size_y))
+            panel_tile[:, :] = 0.0
+
+            for index in range(panel_offsets[panel], panel_offsets[panel + 1]):
+                particle, xshift, yshift, zshift = periodic_copy(
+                    panel_copies[index], box_x, box_y, box_z
+                )
+
+                distance_z = z[particle] + zshift * box_z - z_slice
+
+                deposit(
+                    panel_tile,
+                    x[particle] + xshift * box_x,
+                    y[particle] + yshift * box_y,
+                    distance_z * distance_z,
+                    m[particle],
+                    h[particle],
+                    res,
+                    first_cell_x,
+                    first_cell_y,
+                )
+
+            image[
+                first_cell_x : first_cell_x + size_x,
+                first_cell_y : first_cell_y + size_y,
+            ] = panel_tile
 
     return image
 
 
-@jit(nopython=True, fastmath=True, parallel=True)
 def slice_scatter_parallel(
     x: float64,
     y: float64,
@@ -287,47 +548,23 @@ def slice_scatter_parallel(
     scatter : Create 3D scatter plot of SWIFT data
     scatter_parallel : Create 3D scatter plot of SWIFT data in parallel
     slice_scatter : Create scatter plot of a slice of data
+    slice_scatter_panels : Create scatter plot of a slice of data in panels
 
     Notes
     -----
-    Explicitly defining the types in this function allows
-    for a 25-50% performance improvement. In our testing, using numpy
-    floats and integers is also an improvement over using the numba ones.
+    This renders the image with ``slice_scatter_panels`` using numba's
+    current number of threads. With a single thread there is nothing to
+    share out, and binning the particles into panels would only add to the
+    work of ``slice_scatter``, so that is called instead.
     """
-    # Same as scatter, but executes in parallel! This is actually trivial,
-    # we just make NUM_THREADS images and add them together at the end.
-
-    number_of_particles = x.size
-    core_particles = number_of_particles // NUM_THREADS
-
-    output = zeros((res, res), dtype=float32)
-
-    for thread in prange(NUM_THREADS):
-        # Left edge is easy, just start at 0 and go to 'final'
-        left_edge = thread * core_particles
+    number_of_threads = get_num_threads()
 
-        # Right edge is harder in case of left over particles...
-        right_edge = thread + 1
+    if number_of_threads == 1:
+        return slice_scatter(x, y, z, m, h, z_slice, res, box_x, box_y, box_z)
 
-        if right_edge == NUM_THREADS:
-            right_edge = number_of_particles
-        else:
-            right_edge *= core_particles
-
-        output += slice_scatter(
-            x=x[left_edge:right_edge],
-            y=y[left_edge:right_edge],
-            z=z[left_edge:right_edge],
-            m=m[left_edge:right_edge],
-            h=h[left_edge:right_edge],
-            z_slice=z_slice,
-            res=res,
-            box_x=box_x,
-            box_y=box_y,
-            box_z=box_z,
-        )
-
-    return output
+    return slice_scatter_panels(
+        x, y, z, m, h, z_slice, res, box_x, box_y, box_z, number_of_threads
+    )
 
 
 def slice_gas_pixel_grid(
@@ -366,7 +603,8 @@ def slice_gas_pixel_grid(
     parallel : bool
         used to determine if we will create the image in parallel. This
         defaults to False, but can speed up the creation of large images
-        significantly at the cost of increased memory usage.
+        significantly. The image is split into small tiles that each thread
+        renders in turn, so little more memory is needed than in serial.
 
     rotation_matrix: np.array, optional
         Rotation matrix (3x3) that describes the rotation of the box around
@@ -490,10 +728,10 @@ def slice_gas_pixel_grid(
         x=(x - x_min) / max_range,
         y=(y - y_min) / max_range,
         z=z / max_range,
-        m=m,
-        h=hsml / max_range,
+        m=ascontiguousarray(m, dtype=float32),
+        h=ascontiguousarray(hsml / max_range, dtype=float32),
         z_slice=(z_center + z_slice) / max_range,
-        res=resolution,
+        res=int(resolution),
         box_x=periodic_box_x,
         box_y=periodic_box_y,
         box_z=periodic_box_z,
@@ -547,7 +785,8 @@ def slice_gas(
     parallel : bool, optional
         used to determine if we will create the image in parallel. This
         defaults to False, but can speed up the creation of large images
-        significantly at the cost of increased memory usage.
+        significantly. The image is split into small tiles that each thread
+        renders in turn, so little more memory is needed than in serial.
 
     rotation_matrix: np.array, optional
         Rotation matrix (3x3) that describes the rotation of the box around
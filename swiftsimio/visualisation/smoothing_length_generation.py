@@ -6,7 +6,7 @@ that do not usually carry a smoothing length field (e.g. dark matter).
 from swiftsimio.objects import cosmo_array
 from swiftsimio.optional_packages import KDTree, TREE_AVAILABLE
 from unyt import unyt_array
-from numpy import empty, float32
+from numpy import float32
 
 from typing import Union
 
@@ -54,53 +54,25 @@ def generate_smoothing_lengths(
             "The scipy.spatial.cKDTree class is required to search for smoothing lengths."
         )
 
-    number_of_parts = coordinates.shape[0]
+    positions = coordinates.value
 
-    tree = KDTree(coordinates.value, boxsize=boxsize.to(coordinates.units).value)
-
-    smoothing_lengths = empty(number_of_parts, dtype=float32)
-    smoothing_lengths[-1] = -0.1
+    tree = KDTree(positions, boxsize=boxsize.to(coordinates.units).value)
 
     # Include speedup_fac stuff here:
     neighbours_search = neighbours // speedup_fac
     hsml_correction_fac_speedup = (speedup_fac) ** (1 / dimension)
 
-    # We create a lot of data doing this, so we want to do it in small chunks
-    # such that we keep the memory from filling up - this seems to be a reasonable
-    # chunk size based on previous performance testing. This may change in the
-    # future, or may be computer dependent (cache sizes?).
-    block_size = 65536
-    number_of_blocks = 1 + number_of_parts // block_size
-
-    for block in range(number_of_blocks):
-        starting_index = block * block_size
-        ending_index = (block + 1) * (block_size)
-
-        if ending_index > number_of_parts:
-            ending_index = number_of_parts + 1
-
-        if starting_index >= ending_index:
-            break
-
-        # Get the distances to _all_ neighbours out of the tree - this is
-        # why we need to process in blocks (this is 32x+ the size of coordinates)
-
-        try:
-            d, _ = tree.query(
-                coordinates[starting_index:ending_index].value,
-                k=neighbours_search,
-                workers=-1,
-            )
-        except TypeError:
-            # Backwards compatibility with older versions of
-            # scipy.
-            d, _ = tree.query(
-                coordinates[starting_index:ending_index].value,
-                k=neighbours_search,
-                n_jobs=-1,
-            )
-
-        smoothing_lengths[starting_index:ending_index] = d[:, -1]
+    # Only ask the tree for the distance to the furthest neighbour; asking for
+    # all of them creates 2 * neighbours_search times more data than we have
+    # particles. This lets us query all particles in a single batch.
+    try:
+        d, _ = tree.query(positions, k=[neighbours_search], workers=-1)
+    except TypeError:
+        # Backwards compatibility with older versions of
+        # scipy.
+        d, _ = tree.query(positions, k=[neighbours_search], n_jobs=-1)
+
+    smoothing_lengths = d[:, 0].astype(float32)
 
     if isinstance(coordinates, cosmo_array):
         return cosmo_array(
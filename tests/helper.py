@@ -6,8 +6,10 @@ import subprocess
 import os
 import h5py
 from swiftsimio.subset_writer import find_links, write_metadata
-from swiftsimio import mask, cosmo_array, load
-from numpy import mean
+from swiftsimio import mask, cosmo_array, load, Writer
+from numpy import mean, zeros, ones
+from numpy.random import default_rng
+import unyt
 
 webstorage_location = "http://virgodb.cosma.dur.ac.uk/swift-webstorage/IOExamples/"
 test_data_location = "test_data/"
@@ -129,3 +131,34 @@ def create_single_particle_dataset(filename: str, output_name: str):
     outfile.close()
 
     return
+
+
+def create_gas_snapshot(filename: str, number_of_parts: int = 2000, seed: int = 0):
+    """
+    Writes a small snapshot of randomly placed gas particles, of unit mass, in
+    a 10 cm box, with smoothing lengths generated by the writer.
+
+    Parameters
+    ----------
+    filename: str
+        name of the snapshot to write
+    number_of_parts: int
+        number of gas particles
+    seed: int
+        seed for the particle positions
+    """
+    rng = default_rng(seed)
+    boxsize = [10.0, 10.0, 10.0] * unyt.cm
+
+    unit_system = unyt.UnitSystem(
+        name="default", length_unit=unyt.cm, mass_unit=unyt.g, time_unit=unyt.s
+    )
+    writer = Writer(unit_system, boxsize)
+    writer.gas.coordinates = rng.random((number_of_parts, 3)) * boxsize
+    writer.gas.velocities = zeros((number_of_parts, 3)) * unyt.cm / unyt.s
+    writer.gas.masses = ones(number_of_parts) * unyt.g
+    writer.gas.internal_energy = ones(number_of_parts) * unyt.cm ** 2 / unyt.s ** 2
+    writer.gas.generate_smoothing_lengths(boxsize=boxsize, dimension=3)
+    writer.write(filename)
+
+    return
@@ -7,10 +7,17 @@ from swiftsimio.accelerated import (
     read_ranges_from_file,
     index_dataset,
     list_of_strings_to_arrays,
+    balanced_ranges,
+    tile_size,
+    tile_binner,
+    periodic_copies,
+    periodic_copy,
+    jit,
 )
 
 import numpy as np
 import h5py
+import pytest
 
 from .helper import create_in_memory_hdf5
 
@@ -43,6 +50,113 @@ def test_ranges_from_array_non_contiguous():
     assert (ranges_from_array(my_array) == out).all()
 
 
+def test_balanced_ranges():
+    """
+    Tests that balanced ranges cover all items, in order, with the example
+    given, and fall back to equal-sized ranges for uniform costs.
+    """
+
+    my_cost = np.array([8.0, 1.0, 1.0, 1.0, 1.0, 8.0])
+
+    assert (balanced_ranges(my_cost, 2) == np.array([0, 3, 6])).all()
+
+    edges = balanced_ranges(np.ones(1000), 4)
+
+    assert (edges == np.array([0, 250, 500, 750, 1000])).all()
+
+    # More ranges than items must still cover everything exactly once
+    edges = balanced_ranges(np.ones(3), 8)
+
+    assert edges[0] == 0 and edges[-1] == 3
+    assert (np.diff(edges) >= 0).all()
+
+    # Negative costs would give non-monotonic edges
+    with pytest.raises(AssertionError):
+        balanced_ranges(np.array([5.0, -3.0, -3.0, -3.0, 1.0, 1.0, 1.0, 5.0]), 4)
+
+    return
+
+
+def test_tile_size():
+    """
+    Tests that small images are split into enough tiles for every range,
+    and that large images use the largest tiles.
+    """
+
+    assert tile_size(64, 64, 2, 4) == 16
+    assert tile_size(1024, 64, 2, 4) == 64
+    assert tile_size(64, 32, 3, 4) == 16
+
+    # Tiles are never made smaller than 8 pixels across
+    assert tile_size(16, 64, 2, 64) == 8
+
+    return
+
+
+def test_periodic_copy():
+    """
+    Tests that the periodic copies of each particle are numbered in the same
+    order as the nested loops over the shifts in the serial scatter functions.
+    """
+
+    assert periodic_copies(0.0, 0.0, 0.0) == 1
+    assert periodic_copies(1.0, 1.0, 0.0) == 9
+    assert periodic_copies(1.0, 1.0, 1.0) == 27
+
+    assert periodic_copy(7, 0.0, 0.0, 0.0) == (7, 0, 0, 0)
+
+    copy_index = 2 * 27
+
+    for xshift in range(-1, 2):
+        for yshift in range(-1, 2):
+            for zshift in range(-1, 2):
+                assert periodic_copy(copy_index, 1.0, 1.0, 1.0) == (
+                    2,
+                    xshift,
+                    yshift,
+                    zshift,
+                )
+                copy_index += 1
+
+    assert periodic_copy(9 + 5, 1.0, 1.0, 0.0) == (1, 0, 1, 0)
+
+    return
+
+
+@jit(nopython=True)
+def square_footprint(item, arguments):
+    first_x, last_x, first_y, last_y = arguments
+
+    return first_x[item], last_x[item], first_y[item], last_y[item], 0, 0
+
+
+bin_squares = tile_binner(square_footprint)
+
+
+def test_tile_binner():
+    """
+    Tests that items are binned, in order, into every tile that they overlap
+    and that items that miss the image are dropped, for any number of threads.
+    """
+
+    first_x = np.array([0, 10, 5, 3, 2])
+    last_x = np.array([2, 13, 4, 3, 9])
+    first_y = np.array([0, 0, 0, 9, 2])
+    last_y = np.array([1, 15, 3, 14, 9])
+
+    for number_of_threads in [1, 2, 3, 8]:
+        tile_offsets, tile_items, tile_cost = bin_squares(
+            first_x.size, 8, 2, 2, number_of_threads, (first_x, last_x, first_y, last_y)
+        )
+
+        # Item 2 is empty and is never binned
+        assert (tile_offsets == np.array([0, 2, 4, 6, 8])).all()
+        assert (tile_items == np.array([0, 4, 3, 4, 1, 4, 1, 4])).all()
+        assert (tile_cost == np.array([6 + 36, 6 + 12, 32 + 12, 32 + 4])).all()
+
+    return
+
+
 def test_read_ranges_from_file():
     """
     Tests the reading of ranges from file using a numpy array as a stand in for
@@ -4,6 +4,9 @@ Tests some known good states with the metadata.
 
 from swiftsimio import metadata
 
+import numpy as np
+import unyt
+
 
 def test_same_contents():
     """
@@ -30,3 +33,41 @@ def test_same_contents():
         assert list(cosmology[ptype].keys()) == list(particle[ptype].values())
 
     return
+
+
+def test_generate_units():
+    """
+    Tests that the units generated from the dimension template are correct,
+    and that the returned dictionaries are independent between calls.
+    """
+
+    units = metadata.unit_fields.generate_units(2.0, 3.0, 5.0, 7.0, 11.0)
+
+    assert np.isclose(units["gas"]["density"], 2.0 / 3.0 ** 3)
+    assert np.isclose(units["gas"]["entropy"], 2.0 * 3.0 ** 2 / (5.0 ** 2 * 11.0))
+    assert np.isclose(units["gas"]["specific_sfr"], 1.0 / 5.0)
+    assert np.isclose(units["stars"]["birth_time"], 5.0)
+    assert units["dark_matter"]["particle_ids"] is None
+
+    units["gas"]["density"] = None
+    units = metadata.unit_fields.generate_units(2.0, 3.0, 5.0, 7.0, 11.0)
+
+    assert np.isclose(units["gas"]["density"], 2.0 / 3.0 ** 3)
+
+    # Quantities in the returned dictionaries are not shared between calls
+    specific_sfr = metadata.unit_fields.generate_units(
+        unyt.g, unyt.cm, unyt.s, unyt.A, unyt.K
+    )["gas"]["specific_sfr"]
+    specific_sfr *= 2.0
+    units = metadata.unit_fields.generate_units(unyt.g, unyt.cm, unyt.s, unyt.A, unyt.K)
+
+    assert units["gas"]["specific_sfr"] == 1.0 / unyt.s
+
+    # The specific star formation rate has always been treated as
+    # dimensionless when generating dimensions
+    dimensions = metadata.unit_fields.generate_dimensions()
+
+    assert dimensions["gas"]["specific_sfr"] == 1
+    assert dimensions["gas"]["sfr"] == unyt.dimensions.mass / unyt.dimensions.time
+
+    return
@@ -8,7 +8,9 @@ from swiftsimio.visualisation.smoothing_length_generation import (
 )
 from tests.helper import requires
 
-from numpy import isclose
+from numpy import isclose, absolute, minimum, sort, sqrt
+from numpy.random import default_rng
+from unyt import unyt_array
 
 
 @requires("cosmological_volume.hdf5")
@@ -73,3 +75,38 @@ def test_generate_smoothing_length_faster(filename):
     ).all()
 
     return
+
+
+def test_generate_smoothing_length_brute_force():
+    """
+    Compares the smoothing lengths against a brute-force search for the
+    neighbours in a periodic box.
+    """
+    number_of_parts = 500
+    neighbours = 16
+    kernel_gamma = 1.8
+    box = 2.0
+
+    positions = default_rng(42).random((number_of_parts, 3)) * box
+
+    generated_smoothing_lengths = generate_smoothing_lengths(
+        unyt_array(positions, "Mpc"),
+        boxsize=unyt_array([box] * 3, "Mpc"),
+        kernel_gamma=kernel_gamma,
+        neighbours=neighbours,
+        speedup_fac=1,
+        dimension=3,
+    )
+
+    separations = absolute(positions[:, None, :] - positions[None, :, :])
+    separations = minimum(separations, box - separations)
+    distances = sort(sqrt((separations ** 2).sum(axis=-1)), axis=1)
+
+    # The particle itself counts as one of its neighbours
+    assert isclose(
+        generated_smoothing_lengths.value,
+        distances[:, neighbours - 1] / kernel_gamma,
+        rtol=1e-6,
+    ).all()
+
+    return
@@ -5,22 +5,28 @@ from swiftsimio.visualisation.projection import (
     scatter_parallel,
     project_gas,
     project_pixel_grid,
+    particles_overlapping_image,
 )
 from swiftsimio.visualisation.slice import (
     slice_scatter,
     slice_scatter_parallel,
+    slice_scatter_panels,
     slice_gas,
 )
+from swiftsimio.visualisation.project_and_slice import project_and_slice_gas
 from swiftsimio.visualisation.volume_render import render_gas
-from swiftsimio.visualisation.projection_backends import backends, backends_parallel
+from swiftsimio.visualisation import project_and_slice
+from swiftsimio.visualisation.projection_backends import backends, backend_list
+from swiftsimio.visualisation.projection_backends.fast import scatter_panels
 from swiftsimio.visualisation.smoothing_length_generation import (
     generate_smoothing_lengths,
 )
 from swiftsimio.optional_packages import CudaSupportError, CUDA_AVAILABLE
 from swiftsimio.objects import cosmo_array, a
 from unyt.array import unyt_array
+import unyt
 
-from tests.helper import requires
+from tests.helper import requires, create_gas_snapshot
 
 import numpy as np
 
@@ -36,22 +42,24 @@ def test_scatter(save=False):
     Tests the scatter functions from all backends.
     """
 
-    for backend in backends.keys():
-        try:
-            image = backends[backend](
-                np.array([0.0, 1.0, 1.0, -0.000001]),
-                np.array([0.0, 0.0, 1.0, 1.000001]),
-                np.array([1.0, 1.0, 1.0, 1.0]),
-                np.array([0.2, 0.2, 0.2, 0.000002]),
-                256,
-                1.0,
-                1.0,
-            )
-        except CudaSupportError:
-            if CUDA_AVAILABLE:
-                raise ImportError("Optional loading of the CUDA module is broken")
-            else:
-                continue
+    for backend in backend_list:
+        arguments = (
+            np.array([0.0, 1.0, 1.0, -0.000001]),
+            np.array([0.0, 0.0, 1.0, 1.000001]),
+            np.array([1.0, 1.0, 1.0, 1.0], dtype=backend.dtype),
+            np.array([0.2, 0.2, 0.2, 0.000002], dtype=backend.dtype),
+            256,
+            1.0,
+            1.0,
+        )
+
+        if backend.requires_cuda and not CUDA_AVAILABLE:
+            # Without CUDA, the GPU backends must fail loudly
+            with pytest.raises(CudaSupportError):
+                backend.scatter(*arguments)
+            continue
+
+        image = backend.scatter(*arguments)
 
     if save:
         imsave("test_image_creation.png", image)
@@ -86,16 +94,13 @@ def test_scatter_parallel(save=False):
     as with the serial version.
     """
 
+    rng = np.random.default_rng(7810)
     number_of_parts = 1000
     h_max = np.float32(0.05)
     resolution = 512
 
-    coordinates = (
-        np.random.rand(2 * number_of_parts)
-        .reshape((2, number_of_parts))
-        .astype(np.float64)
-    )
-    hsml = np.random.rand(number_of_parts).astype(np.float32) * h_max
+    coordinates = rng.random((2, number_of_parts))
+    hsml = rng.random(number_of_parts, dtype=np.float32) * h_max
     masses = np.ones(number_of_parts, dtype=np.float32)
 
     image = scatter(coordinates[0], coordinates[1], masses, hsml, resolution, 1.0, 1.0)
@@ -106,7 +111,37 @@ def test_scatter_parallel(save=False):
     if save:
         imsave("test_image_creation.png", image)
 
-    assert np.isclose(image, image_par).all()
+    assert np.allclose(image, image_par)
+
+    return
+
+
+def test_numpy_addat_matches_fast():
+    """
+    Asserts that the pure numpy backend reproduces the fast backend, including
+    for overlapping particles that deposit into the same pixels.
+    """
+
+    rng = np.random.default_rng(6241)
+    number_of_parts = 1000
+    h_max = np.float32(0.05)
+    resolution = 128
+
+    coordinates = rng.random((2, number_of_parts))
+    # Stack many particles on top of each other to test repeated indices
+    coordinates[:, : number_of_parts // 2] = 0.5
+    hsml = rng.random(number_of_parts, dtype=np.float32) * h_max
+    masses = np.ones(number_of_parts, dtype=np.float32)
+
+    for box in [0.0, 1.0]:
+        image = backends["fast"](
+            coordinates[0], coordinates[1], masses, hsml, resolution, box, box
+        )
+        image_numpy = backends["numpy_addat"](
+            coordinates[0], coordinates[1], masses, hsml, resolution, box, box
+        )
+
+        assert np.allclose(image, image_numpy, rtol=1e-4)
 
     return
 
@@ -137,17 +172,14 @@ def test_slice_parallel(save=False):
     as with the serial version.
     """
 
+    rng = np.random.default_rng(5306)
     number_of_parts = 1000
     h_max = np.float32(0.05)
     z_slice = 0.5
     resolution = 256
 
-    coordinates = (
-        np.random.rand(3 * number_of_parts)
-        .reshape((3, number_of_parts))
-        .astype(np.float64)
-    )
-    hsml = np.random.rand(number_of_parts).astype(np.float32) * h_max
+    coordinates = rng.random((3, number_of_parts))
+    hsml = rng.random(number_of_parts, dtype=np.float32) * h_max
     masses = np.ones(number_of_parts, dtype=np.float32)
 
     image = slice(
@@ -178,39 +210,43 @@ def test_slice_parallel(save=False):
     if save:
         imsave("test_image_creation.png", image)
 
-    assert np.isclose(image, image_par).all()
+    assert np.allclose(image, image_par)
 
     return
 
 
 def test_volume_render():
     # render image
-    volume_render.scatter(
-        np.array([0.0, 1.0, 1.0, -0.000001]),
-        np.array([0.0, 0.0, 1.0, 1.000001]),
-        np.array([0.0, 0.0, 1.0, 1.000001]),
-        np.array([1.0, 1.0, 1.0, 1.0]),
-        np.array([0.2, 0.2, 0.2, 0.000002]),
-        64,
-        1.0,
-        1.0,
-        1.0,
-    )
+    for scatter_function in [volume_render.scatter, volume_render.scatter_gpu]:
+        try:
+            scatter_function(
+                np.array([0.0, 1.0, 1.0, -0.000001]),
+                np.array([0.0, 0.0, 1.0, 1.000001]),
+                np.array([0.0, 0.0, 1.0, 1.000001]),
+                np.array([1.0, 1.0, 1.0, 1.0]),
+                np.array([0.2, 0.2, 0.2, 0.000002]),
+                64,
+                1.0,
+                1.0,
+                1.0,
+            )
+        except CudaSupportError:
+            if CUDA_AVAILABLE:
+                raise ImportError("Optional loading of the CUDA module is broken")
+            else:
+                continue
 
     return
 
 
 def test_volume_parallel():
+    rng = np.random.default_rng(2947)
     number_of_parts = 1000
     h_max = np.float32(0.05)
     resolution = 64
 
-    coordinates = (
-        np.random.rand(3 * number_of_parts)
-        .reshape((3, number_of_parts))
-        .astype(np.float64)
-    )
-    hsml = np.random.rand(number_of_parts).astype(np.float32) * h_max
+    coordinates = rng.random((3, number_of_parts))
+    hsml = rng.random(number_of_parts, dtype=np.float32) * h_max
     masses = np.ones(number_of_parts, dtype=np.float32)
 
     image = volume_render.scatter(
@@ -236,7 +272,80 @@ def test_volume_parallel():
         1.0,
     )
 
-    assert np.isclose(image, image_par).all()
+    assert np.allclose(image, image_par)
+
+    return
+
+
+def test_parallel_partial_panels():
+    """
+    The parallel slice and volume render are split into panels (or blocks)
+    that do not divide these resolutions; check the edges against the serial
+    versions, with and without periodic copies. The panels are also rendered
+    directly with several threads, as the parallel functions use the serial
+    ones when numba only has a single thread.
+    """
+    rng = np.random.default_rng(8123)
+    number_of_parts = 1000
+
+    coordinates = rng.random((3, number_of_parts))
+    hsml = rng.random(number_of_parts, dtype=np.float32) * np.float32(0.1)
+    masses = np.ones(number_of_parts, dtype=np.float32)
+    x, y, z = coordinates
+
+    for box in [0.0, 1.0]:
+        image = slice(x, y, z, masses, hsml, 0.5, 100, box, box, box)
+        image_par = slice_scatter_parallel(
+            x, y, z, masses, hsml, 0.5, 100, box, box, box
+        )
+
+        assert np.allclose(image, image_par)
+
+        image = volume_render.scatter(x, y, z, masses, hsml, 40, box, box, box)
+        image_par = volume_render.scatter_parallel(
+            x, y, z, masses, hsml, 40, box, box, box
+        )
+
+        assert np.allclose(image, image_par)
+
+        images = project_and_slice.scatter(
+            x, y, z, masses, hsml, 0.5, 100, box, box, box
+        )
+        images_par = project_and_slice.scatter_parallel(
+            x, y, z, masses, hsml, 0.5, 100, box, box, box
+        )
+
+        assert np.allclose(images[0], images_par[0])
+        assert np.allclose(images[1], images_par[1])
+
+        for number_of_threads in [2, 3]:
+            image = scatter(x, y, masses, hsml, 100, box, box)
+            image_par = scatter_panels(
+                x, y, masses, hsml, 100, box, box, number_of_threads
+            )
+
+            assert np.allclose(image, image_par)
+
+            image = slice(x, y, z, masses, hsml, 0.5, 100, box, box, box)
+            image_par = slice_scatter_panels(
+                x, y, z, masses, hsml, 0.5, 100, box, box, box, number_of_threads
+            )
+
+            assert np.allclose(image, image_par)
+
+            image = volume_render.scatter(x, y, z, masses, hsml, 40, box, box, box)
+            image_par = volume_render.scatter_blocks(
+                x, y, z, masses, hsml, 40, box, box, box, number_of_threads
+            )
+
+            assert np.allclose(image, image_par)
+
+            images_par = project_and_slice.scatter_panels(
+                x, y, z, masses, hsml, 0.5, 100, box, box, box, number_of_threads
+            )
+
+            assert np.allclose(images[0], images_par[0])
+            assert np.allclose(images[1], images_par[1])
 
     return
 
@@ -278,11 +387,181 @@ def test_selection_render(filename):
         region=[0 * bs, 0.001 * bs, 0.25 * bs, 0.75 * bs],
     )
 
+    # Fused projection and slice
+    # render full
+    project_and_slice_gas(data, 256, z_slice=0.5 * bs, parallel=True)
+    # render partial
+    project_and_slice_gas(
+        data, 256, z_slice=0.5 * bs, parallel=True, region=[0.25 * bs, 0.75 * bs] * 2
+    )
+    # render tiny
+    project_and_slice_gas(
+        data, 256, z_slice=0.5 * bs, parallel=True, region=[0 * bs, 0.001 * bs] * 2
+    )
+    # render non-square
+    project_and_slice_gas(
+        data,
+        256,
+        z_slice=0.5 * bs,
+        parallel=True,
+        region=[0 * bs, 0.001 * bs, 0.25 * bs, 0.75 * bs],
+    )
+
     # If they don't crash we're happy!
 
     return
 
 
+def test_project_and_slice():
+    """
+    Tests that the fused projection and slice gives the same images as
+    the separate projection and slice.
+    """
+    rng = np.random.default_rng(9172)
+    number_of_parts = 1000
+    h_max = np.float32(0.05)
+    resolution = 128
+    z_slice = 0.5
+
+    coordinates = rng.random((3, number_of_parts))
+    hsml = rng.random(number_of_parts, dtype=np.float32) * h_max
+    masses = np.ones(number_of_parts, dtype=np.float32)
+
+    image = backends["fast"](
+        coordinates[0], coordinates[1], masses, hsml, resolution, 1.0, 1.0
+    )
+    image_slice = slice_scatter(
+        coordinates[0],
+        coordinates[1],
+        coordinates[2],
+        masses,
+        hsml,
+        z_slice,
+        resolution,
+        1.0,
+        1.0,
+        1.0,
+    )
+
+    for scatter_function in [
+        project_and_slice.scatter,
+        project_and_slice.scatter_parallel,
+    ]:
+        fused_image, fused_slice = scatter_function(
+            coordinates[0],
+            coordinates[1],
+            coordinates[2],
+            masses,
+            hsml,
+            z_slice,
+            resolution,
+            1.0,
+            1.0,
+            1.0,
+        )
+
+        assert np.allclose(image, fused_image)
+        assert np.allclose(image_slice, fused_slice)
+
+    return
+
+
+def test_project_and_slice_gas(tmp_path):
+    """
+    Tests that project_and_slice_gas gives the same images, with the same
+    units, as project_gas and slice_gas on a small synthetic snapshot.
+    """
+    filename = str(tmp_path / "project_and_slice.hdf5")
+    create_gas_snapshot(filename, seed=5331)
+
+    data = load(filename)
+    z_slice = 5.0 * unyt.cm
+
+    for parallel in [False, True]:
+        for region in [None, [2.0, 7.0, 1.0, 9.0] * unyt.cm]:
+            projection, image_slice = project_and_slice_gas(
+                data, 64, z_slice=z_slice, region=region, parallel=parallel
+            )
+            separate_projection = project_gas(
+                data, 64, region=region, parallel=parallel
+            )
+            separate_slice = slice_gas(
+                data, 64, z_slice=z_slice, region=region, parallel=parallel
+            )
+
+            assert projection.units == separate_projection.units
+            assert image_slice.units == separate_slice.units
+            assert np.allclose(projection.value, separate_projection.value)
+            assert np.allclose(image_slice.value, separate_slice.value)
+
+    return
+
+
+def test_particles_overlapping_image():
+    """
+    Tests that only discarding the particles that can't reach the image
+    leaves the image unchanged, for a region that covers a small part of
+    a periodic box.
+    """
+    rng = np.random.default_rng(3581)
+    number_of_parts = 10000
+    box = 20.0
+    resolution = 64
+
+    x = rng.random(number_of_parts) * box - 5.0
+    y = rng.random(number_of_parts) * box - 5.0
+    m = np.ones(number_of_parts, dtype=np.float32)
+    h = rng.random(number_of_parts, dtype=np.float32) * np.float32(0.5)
+
+    overlapping = particles_overlapping_image(x, y, h, resolution, box, box)
+
+    assert overlapping.sum() < number_of_parts // 10
+
+    image = scatter(x, y, m, h, resolution, box, box)
+    image_culled = scatter(
+        x[overlapping],
+        y[overlapping],
+        m[overlapping],
+        h[overlapping],
+        resolution,
+        box,
+        box,
+    )
+
+    assert (image == image_culled).all()
+
+    return
+
+
+def test_histogram_region_without_smoothing_lengths(tmp_path):
+    """
+    Tests that the particles outside of a region are discarded on their
+    positions alone for the histogram backend, which does not use (and so
+    may be given invalid) smoothing lengths.
+    """
+    filename = str(tmp_path / "histogram.hdf5")
+    create_gas_snapshot(filename, seed=4417)
+
+    data = load(filename)
+    region = [2.0, 7.0, 1.0, 6.0] * unyt.cm
+
+    for parallel in [False, True]:
+        arguments = dict(
+            project=None, region=region, parallel=parallel, backend="histogram"
+        )
+        image = project_gas(data, 64, **arguments)
+
+        smoothing_length = data.gas.smoothing_length
+        data.gas.smoothing_length = smoothing_length * np.nan
+        image_without_h = project_gas(data, 64, **arguments)
+        data.gas.smoothing_length = smoothing_length
+
+        assert image.sum() > 0.0
+        assert (image == image_without_h).all()
+
+    return
+
+
 def test_render_outside_region():
     """
     Tests what happens when you use `scatter` on a bunch of particles that live
@@ -300,14 +579,23 @@ def test_render_outside_region():
     m = np.ones_like(h)
     backends["histogram"](x, y, m, h, resolution, 1.0, 1.0)
 
-    for backend in backends_parallel.keys():
-        try:
-            backends[backend](x, y, m, h, resolution, 1.0, 1.0)
-        except CudaSupportError:
-            if CUDA_AVAILABLE:
-                raise ImportError("Optional loading of the CUDA module is broken")
-            else:
-                continue
+    for backend in backend_list:
+        arguments = (
+            x,
+            y,
+            m.astype(backend.dtype or m.dtype),
+            h.astype(backend.dtype or h.dtype),
+            resolution,
+            1.0,
+            1.0,
+        )
+
+        if backend.requires_cuda and not CUDA_AVAILABLE:
+            with pytest.raises(CudaSupportError):
+                backend.scatter(*arguments)
+            continue
+
+        backend.scatter(*arguments)
 
     slice_scatter_parallel(x, y, z, m, h, 0.2, resolution, 1.0, 1.0, 1.0)
 
@@ -411,32 +699,33 @@ def test_periodic_boundary_wrapping():
     masses_non_periodic = np.array([1.0, 1.0])
 
     # test the projection backends scatter functions
-    for backend in backends.keys():
-        try:
-            image1 = backends[backend](
-                x=coordinates_periodic[:, 0],
-                y=coordinates_periodic[:, 1],
-                m=masses_periodic,
-                h=hsml_periodic,
-                res=pixel_resolution,
-                box_x=boxsize,
-                box_y=boxsize,
-            )
-            image2 = backends[backend](
-                x=coordinates_non_periodic[:, 0],
-                y=coordinates_non_periodic[:, 1],
-                m=masses_non_periodic,
-                h=hsml_non_periodic,
-                res=pixel_resolution,
-                box_x=0.0,
-                box_y=0.0,
-            )
-            assert (image1 == image2).all()
-        except CudaSupportError:
-            if CUDA_AVAILABLE:
-                raise ImportError("Optional loading of the CUDA module is broken")
-            else:
-                continue
+    for backend in backend_list:
+        periodic_arguments = dict(
+            x=coordinates_periodic[:, 0],
+            y=coordinates_periodic[:, 1],
+            m=masses_periodic.astype(backend.dtype or masses_periodic.dtype),
+            h=hsml_periodic.astype(backend.dtype or hsml_periodic.dtype),
+            res=pixel_resolution,
+            box_x=boxsize,
+            box_y=boxsize,
+        )
+
+        if backend.requires_cuda and not CUDA_AVAILABLE:
+            with pytest.raises(CudaSupportError):
+                backend.scatter(**periodic_arguments)
+            continue
+
+        image1 = backend.scatter(**periodic_arguments)
+        image2 = backend.scatter(
+            x=coordinates_non_periodic[:, 0],
+            y=coordinates_non_periodic[:, 1],
+            m=masses_non_periodic.astype(backend.dtype or masses_non_periodic.dtype),
+            h=hsml_non_periodic.astype(backend.dtype or hsml_non_periodic.dtype),
+            res=pixel_resolution,
+            box_x=0.0,
+            box_y=0.0,
+        )
+        assert (image1 == image2).all()
 
     # test the slice scatter function
     image1 = slice_scatter(